@@ -0,0 +1,509 @@
+"""
+Copyright 2010  IO Rodeo Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import division
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import tempfile
+import argparse
+import traceback
+import multiprocessing
+import numpy
+import brd_tools
+import brd_generator
+import footprints
+import layouts
+import led_schem_array
+import led_schem_multi_array
+import schem_tools
+
+# Largest allowed exponent of the fitted time ~ scale**exponent relation
+DEFAULT_MAX_EXPONENT = 1.3
+
+# Runs of each case and scale, the fastest is kept
+DEFAULT_REPEAT = 2
+
+
+def makeSyntheticBoard(filename, numModules, numRows=None, numDrawings=0):
+    """
+    Write a synthetic .brd file containing numModules two pad LED modules
+    with references 'D%d,%d' arranged in a grid with numRows rows, followed
+    by numDrawings line segments on the drawing layer. Each module takes 25
+    lines and each segment 4 lines.
+    """
+    if numRows is None:
+        numRows = max(int(numModules**0.5),1)
+    with open(filename,'w') as fid:
+        fid.write(brd_generator.BOARD_HEADER%{
+            'xMin'          : 0,
+            'yMin'          : 0,
+            'xMax'          : 100000,
+            'yMax'          : 100000,
+            'numDrawings'   : numDrawings,
+            'numModules'    : numModules,
+            })
+        for k in range(numModules):
+            i, j = k%numRows, k//numRows
+            fid.write(MODULE_TEMPLATE%{
+                'x'         : 10000 + 3691*j,
+                'y'         : 10000 + 3691*i,
+                'timeStamp' : 0x4E2F0000 + k,
+                'ref'       : 'D%d,%d'%(i,j),
+                })
+        for k in range(numDrawings):
+            fid.write(brd_tools.SEGMENT_TEMPLATE%(0, 10*k, 10000, 10*k, 150, 24))
+        fid.write(brd_generator.BOARD_FOOTER)
+
+
+def timeSegmentDrawer(filename, numSegments):
+    """
+    Time adding numSegments line segments to the board and writing it.
+    """
+    drawer = brd_tools.SegmentDrawer(filename)
+    t0 = time.time()
+    for k in range(numSegments):
+        drawer.addLineSegment(0.0, 0.001*k, 1.0, 0.001*k, 0.015)
+    drawer.flush()
+    t1 = time.time()
+    return t1 - t0
+
+
+def timeSegmentDrawerBulk(filename, numSegments):
+    """
+    Time adding numSegments line segments to the board with a single
+    addSegments call.
+    """
+    drawer = brd_tools.SegmentDrawer(filename)
+    k = numpy.arange(numSegments)
+    coords = numpy.column_stack((0*k, 0.001*k, 0*k + 1.0, 0.001*k))
+    t0 = time.time()
+    drawer.addSegments(coords, 0.015)
+    drawer.flush()
+    t1 = time.time()
+    return t1 - t0
+
+
+def benchSegmentDrawer(numModules=2000, scales=(1000,2000,4000,8000)):
+    """
+    Print time vs. segment count for SegmentDrawer. The time per segment
+    should stay roughly constant as the segment count grows.
+    """
+    print 'SegmentDrawer: %d module board'%(numModules,)
+    print '  %10s %10s %14s %14s'%('segments', 'time (s)', 'us/segment', 'bulk us/seg')
+    tempDir = tempfile.mkdtemp()
+    filename = os.path.join(tempDir,'bench.brd')
+    try:
+        makeSyntheticBoard(filename, numModules)
+        for numSegments in scales:
+            dt = timeSegmentDrawer(filename, numSegments)
+            dtBulk = timeSegmentDrawerBulk(filename, numSegments)
+            print '  %10d %10.4f %14.2f %14.2f'%(
+                    numSegments,
+                    dt,
+                    1.0e6*dt/numSegments,
+                    1.0e6*dtBulk/numSegments,
+                    )
+    finally:
+        os.remove(filename)
+        os.rmdir(tempDir)
+
+
+def scanModulesSplit(filename):
+    """
+    Find the module references and line ranges with readlines and split,
+    the way ComponentPlacer.getModuleDict does.
+    """
+    with open(filename,'r') as fid:
+        lines = fid.readlines()
+    modules = {}
+    for i, line in enumerate(lines):
+        splitLine = line.split()
+        if not splitLine:
+            continue
+        if splitLine[0] == '$MODULE':
+            start = i
+        elif splitLine[0] == 'T0':
+            moduleRef = brd_tools.getModuleRef(line)
+        elif splitLine[0] == '$EndMODULE':
+            modules[moduleRef] = (start, i)
+    return modules
+
+
+def scanModulesMapped(filename):
+    """
+    Find the module references and byte ranges with MappedBoard.
+    """
+    board = brd_tools.MappedBoard(filename)
+    modules = board.modules
+    board.close()
+    return modules
+
+
+def benchModuleScan(scales=(5000,10000,20000,40000)):
+    """
+    Print time to discover the modules of a board with the readlines and
+    split path and with the memory mapped scan.
+    """
+    print 'Module discovery'
+    print '  %10s %12s %14s %14s'%('modules', 'size (MB)', 'split (s)', 'mapped (s)')
+    tempDir = tempfile.mkdtemp()
+    filename = os.path.join(tempDir,'bench.brd')
+    try:
+        for numModules in scales:
+            makeSyntheticBoard(filename, numModules)
+            size = os.path.getsize(filename)/2**20
+            t0 = time.time()
+            splitModules = scanModulesSplit(filename)
+            t1 = time.time()
+            mappedModules = scanModulesMapped(filename)
+            t2 = time.time()
+            assert sorted(splitModules) == sorted(mappedModules)
+            print '  %10d %12.1f %14.4f %14.4f'%(numModules, size, t1 - t0, t2 - t1)
+    finally:
+        os.remove(filename)
+        os.rmdir(tempDir)
+
+
+def benchPlacementChecks(numMoved=1000, scales=(2000,8000,32000)):
+    """
+    Print time to check the placement of numMoved modules on boards of
+    increasing size. The check time should not grow with the board size.
+    """
+    print 'Placement checks: %d modules moved'%(numMoved,)
+    print '  %10s %14s %14s'%('modules', 'index (s)', 'check (s)')
+    tempDir = tempfile.mkdtemp()
+    filename = os.path.join(tempDir,'bench.brd')
+    try:
+        for numModules in scales:
+            makeSyntheticBoard(filename, numModules)
+            placer = brd_tools.ComponentPlacer(filename)
+            names = sorted(placer.modules)[:numMoved]
+            t0 = time.time()
+            placer.enableChecks()
+            t1 = time.time()
+            placer.setModulePositions(names, 0.01, 0, 0)
+            t2 = time.time()
+            print '  %10d %14.4f %14.4f'%(numModules, t1 - t0, t2 - t1)
+    finally:
+        os.remove(filename)
+        os.rmdir(tempDir)
+
+
+def makeLEDParams(name, numParallel, numSeries, numArrays=None):
+    """
+    Returns a parameter dictionary for the schematic generators.
+    """
+    params = {
+            'name'              : name,
+            'numSeries'         : numSeries,
+            'numParallel'       : numParallel,
+            'upperLeft'         : (2500,2000),
+            'spacing'           : (600,400),
+            'annotationOffset'  : (0,-100),
+            'labelOffset'       : (0,100),
+            'stubLength'        : 300,
+            'module'            : 'LED_OVLG',
+            }
+    if numArrays is not None:
+        params['numArrays'] = numArrays
+    return params
+
+
+def benchLEDSchemArray(numSeries=20, scales=(500,1000,2000,4000)):
+    """
+    Print LEDs/second for LEDSchemArray.write at several array sizes.
+    """
+    print 'LEDSchemArray: %d LEDs in series'%(numSeries,)
+    print '  %10s %10s %14s'%('LEDs', 'time (s)', 'LEDs/s')
+    tempDir = tempfile.mkdtemp()
+    name = os.path.join(tempDir,'bench')
+    try:
+        for numParallel in scales:
+            numLEDs = numParallel*numSeries
+            params = makeLEDParams(name, numParallel, numSeries)
+            t0 = time.time()
+            led_schem_array.LEDSchemArray(params).write()
+            dt = time.time() - t0
+            print '  %10d %10.4f %14.0f'%(numLEDs, dt, numLEDs/dt)
+    finally:
+        for ext in ('.sch', '.cmp'):
+            if os.path.exists(name + ext):
+                os.remove(name + ext)
+        os.rmdir(tempDir)
+
+
+def getDeepSize(obj, seen=None):
+    """
+    Returns approximate memory use in bytes of obj and the objects it
+    contains.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(getDeepSize(k,seen) + getDeepSize(v,seen) for k,v in obj.iteritems())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(getDeepSize(v,seen) for v in obj)
+    elif hasattr(obj, '__dict__'):
+        size += getDeepSize(obj.__dict__,seen)
+    return size
+
+
+def benchComponentStore(scales=(10000,100000)):
+    """
+    Print memory used to keep the .cmp data of numLEDs LEDs in a
+    ComponentStore and in the dict of dicts previously used.
+    """
+    print 'ComponentStore memory'
+    print '  %10s %14s %14s %10s'%('LEDs', 'dict (bytes)', 'store (bytes)', 'ratio')
+    for numLEDs in scales:
+        numSeries = 20
+        ledData = {}
+        store = schem_tools.ComponentStore()
+        ledKind = store.addKind('D%d,%d', 'LED', 'LED_OVLG')
+        for k in range(numLEDs):
+            i, j = divmod(k, numSeries)
+            timeStamp = 0x4E2F0000 + k
+            ledData[(i,j)] = {
+                    'reference' : 'D%d,%d'%(i,j),
+                    'timeStamp' : '%08X'%(timeStamp,),
+                    'value'     : 'LED',
+                    'module'    : 'LED_OVLG',
+                    }
+            store.append(ledKind, timeStamp, i, j)
+        dictSize = getDeepSize(ledData)
+        storeSize = getDeepSize(store)
+        print '  %10d %14d %14d %10.1f'%(numLEDs, dictSize, storeSize, dictSize/storeSize)
+
+
+def getPeakMemory():
+    """
+    Returns the peak resident set size of the process in bytes.
+    """
+    maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxRSS
+    return 1024*maxRSS
+
+
+def runCase(setup, scale, tempDir):
+    """
+    Run a benchmark case in a child process. The function returned by
+    setup(scale, tempDir) is timed. Returns the time and the increase of the
+    peak resident set size during the call.
+    """
+    queue = multiprocessing.Queue()
+    def target():
+        try:
+            func = setup(scale, tempDir)
+            memory0 = getPeakMemory()
+            t0 = time.time()
+            func()
+            dt = time.time() - t0
+            queue.put((dt, getPeakMemory() - memory0))
+        except Exception:
+            queue.put(traceback.format_exc())
+    process = multiprocessing.Process(target=target)
+    process.start()
+    result = queue.get()
+    process.join()
+    if isinstance(result, str):
+        raise RuntimeError, 'benchmark case failed\n%s'%(result,)
+    return result
+
+
+def getScalingExponent(scales, times):
+    """
+    Returns the exponent of the least squares fit of times ~ scales**exponent.
+    """
+    return float(numpy.polyfit(numpy.log(scales), numpy.log(times), 1)[0])
+
+
+def setupPlacerLoad(scale, tempDir, lazy=False):
+    filename = os.path.join(tempDir,'bench.brd')
+    makeSyntheticBoard(filename, scale)
+    return lambda: brd_tools.ComponentPlacer(filename, lazy=lazy)
+
+
+def setupPlacerLazyLoad(scale, tempDir):
+    return setupPlacerLoad(scale, tempDir, lazy=True)
+
+
+def setupPlacerPlace(scale, tempDir):
+    filename = os.path.join(tempDir,'bench.brd')
+    makeSyntheticBoard(filename, scale)
+    placer = brd_tools.ComponentPlacer(filename)
+    names = sorted(placer.modules)
+    return lambda: placer.setModulePositions(names, 0.01, 0.01, 900)
+
+
+def setupPlacerWrite(scale, tempDir):
+    filename = os.path.join(tempDir,'bench.brd')
+    makeSyntheticBoard(filename, scale)
+    placer = brd_tools.ComponentPlacer(filename)
+    placer.setModulePositions(sorted(placer.modules), 0.01, 0.01, 900)
+    return lambda: placer.write(os.path.join(tempDir,'out.brd'))
+
+
+def setupSegmentDrawer(scale, tempDir):
+    filename = os.path.join(tempDir,'bench.brd')
+    makeSyntheticBoard(filename, 1000)
+    drawer = brd_tools.SegmentDrawer(filename)
+    k = numpy.arange(scale)
+    coords = numpy.column_stack((0*k, 0.001*k, 0*k + 1.0, 0.001*k))
+    def run():
+        drawer.addSegments(coords, 0.015)
+        drawer.write(os.path.join(tempDir,'out.brd'))
+    return run
+
+
+def setupBoard(scale, tempDir):
+    filename = os.path.join(tempDir,'bench.brd')
+    makeSyntheticBoard(filename, scale)
+    def run():
+        board = brd_tools.Board(filename)
+        board.setModulePositions(sorted(board.modules), 0.01, 0.01, 900)
+        board.addRectangle((0.5,0.5), (101.0,21.0), 0.015)
+        board.write(os.path.join(tempDir,'out.brd'))
+    return run
+
+
+def setupBrdGenerator(scale, tempDir):
+    moduleText = MODULE_TEMPLATE%{'x': 0, 'y': 0, 'timeStamp': 0, 'ref': 'D'}
+    footprint = footprints.Footprint(moduleText.splitlines(True))
+    layout = layouts.gridLayout(scale//100, 100, (1.0,1.0), (0.3691,0.3691))
+    def run():
+        generator = brd_generator.BrdGenerator()
+        generator.addModules(footprint, *layout)
+        generator.write(os.path.join(tempDir,'out.brd'))
+    return run
+
+
+def setupLEDSchemArray(scale, tempDir):
+    params = makeLEDParams(os.path.join(tempDir,'bench'), scale//20, 20)
+    return led_schem_array.LEDSchemArray(params).write
+
+
+def setupLEDSchemMultiArray(scale, tempDir):
+    params = makeLEDParams(os.path.join(tempDir,'bench'), scale//80, 20, numArrays=4)
+    return led_schem_multi_array.LEDSchemMultiArray(params).write
+
+
+def runSuite(scaleFactor=1.0, maxExponent=DEFAULT_MAX_EXPONENT, repeat=DEFAULT_REPEAT, jsonFileName=None):
+    """
+    Run the benchmark cases at their scales multiplied by scaleFactor,
+    printing time, throughput and peak memory at each scale. A case fails
+    when its time grows faster than scale**maxExponent. Returns the list of
+    failed cases and optionally writes the results to jsonFileName.
+    """
+    results = []
+    failed = []
+    for name, unit, setup, scales in BENCH_CASES:
+        scales = [max(int(scaleFactor*scale),1) for scale in scales]
+        print '%s'%(name,)
+        print '  %10s %10s %14s %14s'%(unit, 'time (s)', '%s/s'%(unit,), 'peak (MB)')
+        times = []
+        caseResult = {'name': name, 'unit': unit, 'runs': []}
+        for scale in scales:
+            tempDir = tempfile.mkdtemp()
+            try:
+                dt, memory = min(runCase(setup, scale, tempDir) for k in range(repeat))
+            finally:
+                shutil.rmtree(tempDir)
+            times.append(dt)
+            caseResult['runs'].append({'scale': scale, 'time': dt, 'peakMemory': memory})
+            print '  %10d %10.4f %14.0f %14.1f'%(scale, dt, scale/dt, memory/2**20)
+        exponent = getScalingExponent(scales, times)
+        caseResult['exponent'] = exponent
+        caseResult['passed'] = exponent <= maxExponent
+        if not caseResult['passed']:
+            failed.append(name)
+        print '  scaling exponent %1.2f %s'%(exponent, 'ok' if caseResult['passed'] else 'FAIL')
+        results.append(caseResult)
+    if jsonFileName is not None:
+        with open(jsonFileName,'w') as fid:
+            json.dump(results, fid, indent=2)
+    return failed
+
+
+# Benchmark cases: name, unit, setup function, scales
+BENCH_CASES = (
+        ('ComponentPlacer load', 'modules', setupPlacerLoad, (2000,4000,8000,16000)),
+        ('ComponentPlacer lazy load', 'modules', setupPlacerLazyLoad, (2000,4000,8000,16000)),
+        ('ComponentPlacer place', 'modules', setupPlacerPlace, (2000,4000,8000,16000)),
+        ('ComponentPlacer write', 'modules', setupPlacerWrite, (2000,4000,8000,16000)),
+        ('Board place and draw', 'modules', setupBoard, (2000,4000,8000,16000)),
+        ('BrdGenerator', 'modules', setupBrdGenerator, (5000,10000,20000,40000)),
+        ('SegmentDrawer bulk', 'segments', setupSegmentDrawer, (10000,20000,40000,80000)),
+        ('LEDSchemArray', 'LEDs', setupLEDSchemArray, (5000,10000,20000,40000)),
+        ('LEDSchemMultiArray', 'LEDs', setupLEDSchemMultiArray, (5000,10000,20000,40000)),
+        )
+
+MODULE_TEMPLATE = """$MODULE LED-3MM
+Po %(x)d %(y)d 0 15 %(timeStamp)08X %(timeStamp)08X ~~
+Li LED-3MM
+Sc %(timeStamp)08X
+AR /%(timeStamp)08X
+Op 0 0 0
+T0 0 -1000 400 400 0 100 N V 21 N"%(ref)s"
+T1 0 1000 400 400 0 100 N V 21 N"LED"
+DS -500 -500 500 -500 80 21
+DS 500 -500 500 500 80 21
+$PAD
+Sh "1" C 600 600 0 0 0
+Dr 320 0 0
+At STD N 00E0FFFF
+Ne 0 ""
+Po -500 0
+$EndPAD
+$PAD
+Sh "2" R 600 600 0 0 0
+Dr 320 0 0
+At STD N 00E0FFFF
+Ne 0 ""
+Po 500 0
+$EndPAD
+$EndMODULE  LED-3MM
+"""
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Run the performance benchmarks.')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the benchmark scales by SCALE')
+    parser.add_argument('--max-exponent', type=float, default=DEFAULT_MAX_EXPONENT, help='fail when time grows faster than scale**MAX_EXPONENT')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs of each case, the fastest is kept')
+    parser.add_argument('--json', help='write the results to JSON')
+    parser.add_argument('--compare', action='store_true', help='also run the implementation comparisons')
+    args = parser.parse_args()
+
+    if args.compare:
+        benchSegmentDrawer()
+        benchModuleScan()
+        benchPlacementChecks()
+        benchLEDSchemArray()
+        benchComponentStore()
+
+    failed = runSuite(args.scale, args.max_exponent, args.repeat, args.json)
+    if failed:
+        print 'superlinear scaling: %s'%(', '.join(failed),)
+        sys.exit(1)
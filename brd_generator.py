@@ -0,0 +1,204 @@
+"""
+Copyright 2010  IO Rodeo Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Generates complete .brd files without a template board, e.g. for the LED
+array schematic generated from params
+
+    footprint = footprints.loadFootprint('led.mod','LED-3MM')
+    generator = BrdGenerator(params)
+    generator.addModules(footprint,*layouts.gridLayout(100,500,(1.0,1.0),(0.2,0.2)))
+    generator.addRectangle((0.5,0.5),(101.0,21.0),0.015)
+    generator.write('ledarray.brd')
+"""
+from __future__ import division
+import numpy
+from brd_tools import DrawingMixin, roundHalfAway, writeFileAtomic
+from schem_tools import TimeStampAllocator, getTimeStampSeed
+
+DEFAULT_MODULE_CHUNK_SIZE = 1024
+
+
+class BrdGenerator(DrawingMixin):
+    """
+    Board writer which emits the $MODULE blocks of placed footprints and
+    any added drawings in one streaming pass. Modules are kept as columns of
+    references, positions and timestamps until write, where they are
+    formatted from the footprint templates in chunks of chunkSize modules.
+
+    Module timestamps are allocated from timeStamps, a
+    schem_tools.TimeStampAllocator which may be shared with other
+    generators. By default it is seeded from params as the schematic
+    generators do, see schem_tools.getTimeStampSeed, so modules added in
+    the order of the schematic's components get the schematic's timestamps.
+    Without params the seed is derived from the first modules added.
+    """
+
+    def __init__(self,params=None,chunkSize=DEFAULT_MODULE_CHUNK_SIZE,timeStamps=None):
+        self.params = params
+        self.chunkSize = chunkSize
+        self.timeStamps = timeStamps
+        if timeStamps is None and params is not None:
+            seed = params.get('timeStampSeed',getTimeStampSeed(params))
+            self.timeStamps = TimeStampAllocator(seed)
+        self.moduleGroups = []
+        self.numModules = 0
+        self.pendingLines = []
+        self.numPending = 0
+
+    def addModules(self,footprint,refs,x,y,ang=0,value=None,timeStamps=None):
+        """
+        Add modules of a footprint with references refs at absolute
+        positions x, y (inches) and orientation ang (0.1 degrees), as
+        returned by the functions in layouts.py. The value defaults to the
+        footprint's value text (field 1), e.g. LED as in the schematic. Unless timeStamps are given the modules get the next
+        timestamps of the generator's TimeStampAllocator.
+        """
+        refs = list(refs)
+        num = len(refs)
+        x, y, ang = [numpy.broadcast_to(numpy.asarray(v,dtype=float),(num,)) for v in (x,y,ang)]
+        if timeStamps is None:
+            if self.timeStamps is None:
+                seedParams = {'module': footprint.name, 'refs': refs}
+                self.timeStamps = TimeStampAllocator(getTimeStampSeed(seedParams))
+            timeStamps = self.timeStamps.allocateRange(num)
+        if value is None:
+            value = dict(footprint.texts).get(1,footprint.name)
+        self.moduleGroups.append((
+            footprint,
+            refs,
+            roundHalfAway(10000*x),
+            roundHalfAway(10000*y),
+            roundHalfAway(ang)%3600,
+            numpy.asarray(timeStamps,dtype=numpy.int64),
+            value,
+            ))
+        self.numModules += num
+
+    def getBoundingBox(self):
+        """
+        Returns (xMin, yMin, xMax, yMax) of the module positions.
+        """
+        if self.numModules == 0:
+            return 0, 0, 0, 0
+        x = numpy.concatenate([group[2] for group in self.moduleGroups])
+        y = numpy.concatenate([group[3] for group in self.moduleGroups])
+        return x.min(), y.min(), x.max(), y.max()
+
+    def getModuleText(self):
+        """
+        Generator returning the text of the modules in chunks.
+        """
+        for footprint, refs, x, y, ang, timeStamps, value in self.moduleGroups:
+            for start in range(0,len(refs),self.chunkSize):
+                end = start + self.chunkSize
+                values = footprint.getModuleValues(
+                        refs[start:end],
+                        x[start:end].tolist(),
+                        y[start:end].tolist(),
+                        ang[start:end].tolist(),
+                        timeStamps[start:end].tolist(),
+                        value,
+                        )
+                template = footprint.template
+                yield ''.join([template%moduleValues for moduleValues in values])
+
+    def getBoardText(self):
+        """
+        Generator returning the text of the board.
+        """
+        xMin, yMin, xMax, yMax = self.getBoundingBox()
+        yield BOARD_HEADER%{
+                'xMin'          : xMin,
+                'yMin'          : yMin,
+                'xMax'          : xMax,
+                'yMax'          : yMax,
+                'numDrawings'   : self.numPending,
+                'numModules'    : self.numModules,
+                }
+        for text in self.getModuleText():
+            yield text
+        for text in self.pendingLines:
+            yield text
+        yield BOARD_FOOTER
+
+    def write(self,filename):
+        """
+        Write the .brd file, see brd_tools.writeFileAtomic.
+        """
+        writeFileAtomic(filename,self.getBoardText())
+
+
+# Arguments: bounding box, numbers of drawings and modules
+BOARD_HEADER = """PCBNEW-BOARD Version 1 date Tue 26 Jul 2011 10:35:17 AM PDT
+
+# Created by Pcbnew(20090216-final)
+
+$GENERAL
+LayerCount 2
+Ly 1FFF8001
+Links 0
+NoConn 0
+Di %(xMin)d %(yMin)d %(xMax)d %(yMax)d
+Ndraw %(numDrawings)d
+Ntrack 0
+Nzone 0
+Nmodule %(numModules)d
+Nnets 1
+$EndGENERAL
+
+$SHEETDESCR
+Sheet A4 11700 8267
+Title ""
+Date "26 jul 2011"
+Rev ""
+Comp ""
+Comment1 ""
+Comment2 ""
+Comment3 ""
+Comment4 ""
+$EndSHEETDESCR
+
+$SETUP
+InternalUnit 0.000100 INCH
+ZoneGridSize 250
+Layers 2
+TrackWidth 170
+TrackClearence 60
+DrawSegmWidth 150
+EdgeSegmWidth 150
+ViaSize 450
+ViaDrill 250
+TextPcbWidth 120
+TextPcbSize 600 800
+EdgeModWidth 150
+TextModSize 600 600
+TextModWidth 120
+PadSize 600 600
+PadDrill 320
+AuxiliaryAxisOrg 0 0
+$EndSETUP
+
+$EQUIPOT
+Na 0 ""
+St ~
+$EndEQUIPOT
+"""
+
+BOARD_FOOTER = """$TRACK
+$EndTRACK
+$ZONE
+$EndZONE
+$EndBOARD
+"""
@@ -14,131 +14,870 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 from __future__ import division
+import os
+import re
 import sys
+import errno
+import mmap
+import zlib
+import bisect
+import collections
+import cPickle
 import numpy
+from instrument import instrumented, NULL_INSTRUMENT
+
+# Number of parsed modules kept by LazyModuleDict
+DEFAULT_MODULE_CACHE_SIZE = 1024
+
+
+def getLayerNum(layer):
+    """
+    Returns the layer number for the given layer name.
+    """
+    try:
+        return LAYER_NUMS[layer.lower()]
+    except KeyError:
+        raise ValueError, 'unknown layer: %s'%(layer,)
+
+
+def getModuleRef(line):
+    """
+    Returns the module reference from the module's T0 line.
+    """
+    return line.split()[-1][2:-1]
+
+
+def roundHalfAway(values):
+    """
+    Round array values to integers with halves rounded away from zero, the
+    same as the builtin round.
+    """
+    values = numpy.asarray(values,dtype=float)
+    return (numpy.sign(values)*numpy.floor(numpy.abs(values) + 0.5)).astype(numpy.int64)
+
+
+def setPoLine(line,x,y,ang):
+    """
+    Returns the module Po line with the position set to x, y (1/10000 inch)
+    and the orientation set to ang (0.1 degrees).
+    """
+    splitLine = line.split()
+    splitLine[1:4] = '%d'%(x,), '%d'%(y,), '%d'%(ang,)
+    return '%s\n'%(' '.join(splitLine),)
+
+
+def setShLine(line,ang):
+    """
+    Returns the pad Sh line with the pad orientation set to ang (0.1
+    degrees).
+    """
+    splitLine = line.split()
+    splitLine[-1] = '%d'%(ang,)
+    return '%s\n'%(' '.join(splitLine),)
+
+
+def getMovedPos(pos,moves):
+    """
+    Returns the module position (x, y, ang) reached from pos (1/10000 inch,
+    0.1 degrees) by the moves, a list of (x, y, ang) offsets in inches and
+    0.1 degrees, along with the total rotation. The position is rounded after
+    each move, as ComponentPlacer.setModulePos does.
+    """
+    x, y, ang = pos
+    rotation = 0
+    for moveX, moveY, moveAng in moves:
+        moveAng = int(round(moveAng))
+        x = int(round(x + 10000*moveX))
+        y = int(round(y + 10000*moveY))
+        ang = (ang + moveAng)%3600
+        rotation += moveAng
+    return (x, y, ang), rotation
+
+
+def getLineChecksum(line):
+    """
+    Returns crc32 of the whitespace normalized contents of line.
+    """
+    return zlib.crc32(' '.join(line.split())) & 0xFFFFFFFF
+
+
+def readRange(fid,start,end,chunkSize=2**20):
+    """
+    Generator returning bytes start to end (the end of the file if end is
+    None) of fid in chunks.
+    """
+    fid.seek(start)
+    remaining = None if end is None else end - start
+    while remaining is None or remaining > 0:
+        size = chunkSize if remaining is None else min(chunkSize,remaining)
+        data = fid.read(size)
+        if not data:
+            break
+        yield data
+        if remaining is not None:
+            remaining -= len(data)
+
+
+def writeFileAtomic(filename,chunks,mode='w'):
+    """
+    Write the strings in chunks to filename with writelines. The output goes
+    to a temporary file in the same directory which is synced to disk and
+    then replaces filename, so an interrupted or failed write leaves any
+    existing file unchanged. A symbolic link is followed and its target
+    replaced. The mode of an existing file is kept, a new file gets the
+    default mode for the umask.
+    """
+    filename = os.path.realpath(filename)
+    dirName = os.path.dirname(filename)
+    try:
+        fileMode = os.stat(filename).st_mode
+    except OSError:
+        fileMode = None
+    tempFid, tempName = openTempFile(dirName)
+    try:
+        with os.fdopen(tempFid,mode) as fid:
+            fid.writelines(chunks)
+            fid.flush()
+            os.fsync(fid.fileno())
+        if fileMode is not None:
+            os.chmod(tempName,fileMode & 07777)
+        os.rename(tempName,filename)
+    except:
+        os.remove(tempName)
+        raise
+    syncDir(dirName)
+
+
+def openTempFile(dirName,suffix='.brd'):
+    """
+    Create a new temporary file in dirName and return its file descriptor
+    and name. Unlike tempfile.mkstemp the file is created with the default
+    mode for the umask rather than owner only.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os,'O_BINARY',0)
+    while True:
+        tempName = os.path.join(dirName,'.tmp%s%s'%(os.urandom(6).encode('hex'),suffix))
+        try:
+            return os.open(tempName,flags,0666), tempName
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+
+
+def syncDir(dirName):
+    """
+    Sync the directory dirName to disk so a rename in it is durable. Ignored
+    where directories cannot be opened, e.g. on Windows.
+    """
+    try:
+        dirFid = os.open(dirName,os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dirFid)
+    except OSError:
+        pass
+    finally:
+        os.close(dirFid)
+
+
+def getEdgeSegments(lines,layer='edges_pcb'):
+    """
+    Returns (N,5) array of the (x0, y0, x1, y1, width) values, in 1/10000
+    inch, of the $DRAWSEGMENT line segments on the given layer.
+    """
+    layerNum = getLayerNum(layer)
+    segments = []
+    values = None
+    for line in lines:
+        if values is None:
+            if line.startswith('$DRAWSEGMENT'):
+                values = []
+            continue
+        splitLine = line.split()
+        if not splitLine:
+            continue
+        if splitLine[0] == 'Po':
+            # Only straight segments (shape 0) are used
+            if splitLine[1] == '0':
+                values = [int(val) for val in splitLine[2:7]]
+        elif splitLine[0] == 'De':
+            if int(splitLine[1]) == layerNum and len(values) == 5:
+                segments.append(values)
+        elif splitLine[0] == '$EndDRAWSEGMENT':
+            values = None
+    return numpy.array(segments,dtype=float).reshape(-1,5)
+
+
+def rotatePoints(x,y,ang):
+    """
+    Returns the points x, y rotated by ang (0.1 degrees) in the same way as
+    pcbnew's RotatePoint. All arguments may be arrays.
+    """
+    angRad = numpy.asarray(ang,dtype=float)*numpy.pi/1800
+    cos, sin = numpy.cos(angRad), numpy.sin(angRad)
+    return x*cos + y*sin, y*cos - x*sin
+
+
+def getPadPositions(modules,padNames):
+    """
+    Returns (N,2) array of the board positions, in 1/10000 inch, of the pad
+    named padNames[k] of modules[k]. The pads of all modules are rotated in
+    a single array operation.
+    """
+    pos = numpy.array([module.pos for module in modules],dtype=float).reshape(-1,3)
+    offsets = []
+    for module, padName in zip(modules,padNames):
+        for pad in module.pads:
+            if pad.name == padName:
+                offsets.append(pad.offset)
+                break
+        else:
+            raise KeyError, 'module, %s, has no pad %s'%(module.ref,padName)
+    offsets = numpy.array(offsets,dtype=float).reshape(-1,2)
+    x, y = rotatePoints(offsets[:,0],offsets[:,1],pos[:,2])
+    return numpy.column_stack((pos[:,0] + x, pos[:,1] + y))
+
+
+def getModuleBoxes(modules):
+    """
+    Returns (N,4) array of the (xMin, yMin, xMax, yMax) bounding boxes, in
+    1/10000 inch, of the pads of the modules. The pads of all modules are
+    rotated and offset in a single array operation. A module without pads
+    gets an empty box at its position.
+    """
+    num = len(modules)
+    pos = numpy.array([module.pos for module in modules],dtype=float).reshape(-1,3)
+    numPads = numpy.array([len(module.pads) for module in modules],dtype=int)
+    pads = [pad for module in modules for pad in module.pads]
+    boxes = numpy.column_stack((pos[:,:2],pos[:,:2]))
+    if not pads:
+        return boxes
+    padModules = numpy.repeat(numpy.arange(num),numPads)
+    offsets = numpy.array([pad.offset for pad in pads],dtype=float)
+    sizes = numpy.array([pad.size for pad in pads],dtype=float)
+    padAng = numpy.array([pad.angle for pad in pads],dtype=float)*numpy.pi/1800
+
+    # Pad centers, rotated with the module
+    x, y = rotatePoints(offsets[:,0],offsets[:,1],pos[padModules,2])
+    x += pos[padModules,0]
+    y += pos[padModules,1]
+
+    # Half extents of the rotated pads
+    cos, sin = numpy.abs(numpy.cos(padAng)), numpy.abs(numpy.sin(padAng))
+    halfX = 0.5*(sizes[:,0]*cos + sizes[:,1]*sin)
+    halfY = 0.5*(sizes[:,0]*sin + sizes[:,1]*cos)
+
+    hasPads = numPads > 0
+    starts = (numpy.cumsum(numPads) - numPads)[hasPads]
+    boxes[hasPads,0] = numpy.minimum.reduceat(x - halfX,starts)
+    boxes[hasPads,1] = numpy.minimum.reduceat(y - halfY,starts)
+    boxes[hasPads,2] = numpy.maximum.reduceat(x + halfX,starts)
+    boxes[hasPads,3] = numpy.maximum.reduceat(y + halfY,starts)
+    return boxes
+
+
+def getPointSegmentDistance(x,y,segment):
+    """
+    Returns distance from point x, y to the line segment (x0, y0, x1, y1).
+    """
+    x0, y0, x1, y1 = segment
+    dx, dy = x1 - x0, y1 - y0
+    lengthSq = dx*dx + dy*dy
+    if lengthSq == 0:
+        t = 0
+    else:
+        t = min(max(((x - x0)*dx + (y - y0)*dy)/lengthSq,0),1)
+    return numpy.hypot(x - x0 - t*dx, y - y0 - t*dy)
+
+
+def getSegmentBoxDistance(segment,box):
+    """
+    Returns distance from the line segment (x0, y0, x1, y1) to the box (xMin,
+    yMin, xMax, yMax), zero if they intersect.
+    """
+    x0, y0, x1, y1 = segment
+    xMin, yMin, xMax, yMax = box
+    # Clip the segment to the box (Liang-Barsky), it intersects the box if
+    # anything is left.
+    t0, t1 = 0.0, 1.0
+    dx, dy = x1 - x0, y1 - y0
+    for p, q in ((-dx, x0 - xMin), (dx, xMax - x0), (-dy, y0 - yMin), (dy, yMax - y0)):
+        if p == 0:
+            if q < 0:
+                t0, t1 = 1.0, 0.0
+                break
+        elif p < 0:
+            t0 = max(t0,q/p)
+        else:
+            t1 = min(t1,q/p)
+    if t0 <= t1:
+        return 0.0
+    corners = ((xMin,yMin), (xMin,yMax), (xMax,yMin), (xMax,yMax))
+    dist = min(getPointSegmentDistance(x,y,segment) for x, y in corners)
+    for x, y in ((x0,y0), (x1,y1)):
+        boxDx = max(xMin - x, 0, x - xMax)
+        boxDy = max(yMin - y, 0, y - yMax)
+        dist = min(dist,numpy.hypot(boxDx,boxDy))
+    return dist
+
+
+class Pad(object):
+    """
+    Index entry for a pad of a module. The line attribute is the line number
+    of the pad's Sh line, angle the pad orientation (0.1 degrees), size the
+    pad size, offset the pad position relative to the module (1/10000 inch)
+    and net the pad's net code.
+    """
+
+    __slots__ = ('name', 'line', 'angle', 'size', 'offset', 'net')
+
+    def __init__(self,name,line,angle,size,offset=(0,0),net=0):
+        self.name = name
+        self.line = line
+        self.angle = angle
+        self.size = size
+        self.offset = offset
+        self.net = net
+
+
+class Module(object):
+    """
+    Index entry for a module in a .brd file. The lines from start to end
+    (inclusive) make up the module, posLine is the line number of the
+    module's Po line, pos the cached (x, y, ang) values of that line in
+    1/10000 inch and 0.1 degrees and pads a list of Pad entries.
+    """
+
+    __slots__ = ('ref', 'start', 'end', 'posLine', 'pos', 'pads')
+
+    def __init__(self,start):
+        self.ref = None
+        self.start = start
+        self.end = None
+        self.posLine = None
+        self.pos = None
+        self.pads = []
+
+
+def getModuleBounds(lines):
+    """
+    Returns dictionary of the (start, end) line numbers of the modules in
+    lines indexed by reference.
+    """
+    moduleBounds = {}
+    start = None
+    for i, line in enumerate(lines):
+        if line[:1] not in '$T':
+            continue
+        if line.startswith('$MODULE'):
+            start = i
+            moduleRef = None
+        elif start is None:
+            continue
+        elif line.startswith('T0 '):
+            moduleRef = getModuleRef(line)
+        elif line.startswith('$EndMODULE'):
+            if moduleRef is None:
+                raise ValueError, 'module has no reference'
+            moduleBounds[moduleRef] = (start, i)
+            start = None
+    return moduleBounds
+
+
+def parseModule(lines,start):
+    """
+    Returns Module index entry for the module starting on line start. The
+    entry holds the line numbers of the module's Po and pad Sh lines along
+    with their parsed values.
+    """
+    module = Module(start)
+    pad = None
+    for i in xrange(start+1,len(lines)):
+        line = lines[i]
+        splitLine = line.split()
+        if not splitLine:
+            continue
+        key = splitLine[0]
+        if key == '$EndMODULE':
+            module.end = i
+            break
+        elif key == 'T0':
+            module.ref = getModuleRef(line)
+        elif key == 'Po':
+            if module.posLine is None and len(splitLine) > 3:
+                module.posLine = i
+                module.pos = tuple(int(val) for val in splitLine[1:4])
+            elif pad is not None:
+                pad.offset = int(splitLine[1]), int(splitLine[2])
+        elif key == 'Sh':
+            size = int(splitLine[-5]), int(splitLine[-4])
+            pad = Pad(splitLine[1][1:-1],i,int(splitLine[-1]),size)
+            module.pads.append(pad)
+        elif key == 'Ne':
+            if pad is not None:
+                pad.net = int(splitLine[1])
+        elif key == '$EndPAD':
+            pad = None
+    if module.end is None:
+        raise ValueError, 'end of module not found'
+    if module.ref is None:
+        raise ValueError, 'module has no reference'
+    if module.posLine is None:
+        raise ValueError, 'module, %s,  position not found'%(module.ref,)
+    return module
+
+
+class LazyModuleDict(collections.Mapping):
+    """
+    Read only dictionary of Module index entries indexed by reference which
+    parses a module from lines the first time it is accessed. At most
+    cacheSize parsed modules are kept, the least recently used are dropped
+    and parsed again from lines when needed. Since the index entries are
+    rebuilt from lines, changes to a module must be made to its lines, as
+    ComponentPlacer does, and entries obtained earlier may be out of date.
+    """
+
+    def __init__(self,lines,moduleBounds,cacheSize=DEFAULT_MODULE_CACHE_SIZE):
+        if cacheSize < 1:
+            raise ValueError, 'cache size must be at least 1'
+        self.lines = lines
+        self.moduleBounds = moduleBounds
+        self.cacheSize = cacheSize
+        self.cache = collections.OrderedDict()
+
+    def __getitem__(self,name):
+        try:
+            module = self.cache.pop(name)
+        except KeyError:
+            start, end = self.moduleBounds[name]
+            module = parseModule(self.lines,start)
+            if len(self.cache) >= self.cacheSize:
+                self.cache.popitem(last=False)
+        self.cache[name] = module
+        return module
+
+    def __contains__(self,name):
+        return name in self.moduleBounds
+
+    def __iter__(self):
+        return iter(self.moduleBounds)
+
+    def __len__(self):
+        return len(self.moduleBounds)
+
+
+class GridIndex(object):
+    """
+    Spatial hash of axis aligned boxes. The plane is divided into square
+    cells of side cellSize and each box is listed in the cells it covers, so
+    a query only looks at the boxes in the cells covered by the query box.
+    Items which cover only part of their box, such as long diagonal
+    segments, can be listed in fewer cells, see getSegmentCells.
+    """
+
+    def __init__(self,cellSize):
+        if cellSize <= 0:
+            raise ValueError, 'cell size must be positive'
+        self.cellSize = cellSize
+        self.cells = {}
+        self.boxes = {}
+        self.keyCells = {}
+
+    def getCells(self,box):
+        """
+        Returns list of the (i, j) cells covered by box.
+        """
+        xMin, yMin, xMax, yMax = [int(numpy.floor(val/self.cellSize)) for val in box]
+        return [(i,j) for i in range(xMin,xMax+1) for j in range(yMin,yMax+1)]
+
+    def getSegmentCells(self,segment,grow=0):
+        """
+        Returns list of the (i, j) cells covered by the line segment (x0, y0,
+        x1, y1) grown by grow on all sides. For each column of cells only the
+        rows spanned by the part of the segment within grow of the column
+        are included.
+        """
+        x0, y0, x1, y1 = segment
+        if x0 > x1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        cellSize = self.cellSize
+        iMin = int(numpy.floor((x0 - grow)/cellSize))
+        iMax = int(numpy.floor((x1 + grow)/cellSize))
+        cells = []
+        for i in range(iMin,iMax+1):
+            xa = min(max(x0,i*cellSize - grow),x1)
+            xb = max(min(x1,(i+1)*cellSize + grow),x0)
+            if x1 > x0:
+                ya = y0 + (xa - x0)*(y1 - y0)/(x1 - x0)
+                yb = y0 + (xb - x0)*(y1 - y0)/(x1 - x0)
+            else:
+                ya, yb = y0, y1
+            jMin = int(numpy.floor((min(ya,yb) - grow)/cellSize))
+            jMax = int(numpy.floor((max(ya,yb) + grow)/cellSize))
+            cells.extend((i,j) for j in range(jMin,jMax+1))
+        return cells
+
+    def insert(self,key,box,cells=None):
+        """
+        Add box with the given key, replacing any box with the same key. The
+        box is listed in cells if given, otherwise in all cells it covers.
+        """
+        if key in self.boxes:
+            self.remove(key)
+        box = tuple(box)
+        if cells is None:
+            cells = self.getCells(box)
+        self.boxes[key] = box
+        self.keyCells[key] = cells
+        for cell in cells:
+            self.cells.setdefault(cell,set()).add(key)
+
+    def remove(self,key):
+        del self.boxes[key]
+        for cell in self.keyCells.pop(key):
+            cellKeys = self.cells[cell]
+            cellKeys.discard(key)
+            if not cellKeys:
+                del self.cells[cell]
+
+    def query(self,box):
+        """
+        Returns set of the keys of the boxes which overlap box. Boxes which
+        only touch are not counted.
+        """
+        xMin, yMin, xMax, yMax = box
+        keys = set()
+        for cell in self.getCells(box):
+            keys.update(self.cells.get(cell,()))
+        found = set()
+        for key in keys:
+            otherXMin, otherYMin, otherXMax, otherYMax = self.boxes[key]
+            if otherXMin < xMax and xMin < otherXMax and otherYMin < yMax and yMin < otherYMax:
+                found.add(key)
+        return found
+
+
+class PlacementChecker(object):
+    """
+    Checks module placements for overlaps with other modules and for edge
+    clearance violations. Module pad bounding boxes and the edge segments,
+    grown by the clearance, are kept in grid indices so the cost of a check
+    depends on the number of nearby items rather than the board size.
+    Distances are in 1/10000 inch.
+
+    Violations are reported as tuples ('overlap', ref, otherRef) and
+    ('edge', ref, (x0, y0, x1, y1)) with the segment end points in inches.
+    """
+
+    def __init__(self,modules,edgeSegments,edgeClearance=0,cellSize=None):
+        self.edgeClearance = edgeClearance
+        boxes = getModuleBoxes(modules)
+        if cellSize is None:
+            cellSize = DEFAULT_CHECK_CELL_SIZE
+            if len(modules) > 0:
+                medianSize = numpy.median(numpy.maximum(boxes[:,2] - boxes[:,0], boxes[:,3] - boxes[:,1]))
+                cellSize = max(2*medianSize,DEFAULT_CHECK_CELL_SIZE)
+        self.moduleIndex = GridIndex(cellSize)
+        for module, box in zip(modules,boxes.tolist()):
+            self.moduleIndex.insert(module.ref,box)
+        self.edgeSegments = numpy.asarray(edgeSegments,dtype=float).reshape(-1,5)
+        self.edgeIndex = GridIndex(cellSize)
+        for k, (x0, y0, x1, y1, width) in enumerate(self.edgeSegments.tolist()):
+            grow = 0.5*width + edgeClearance
+            box = min(x0,x1) - grow, min(y0,y1) - grow, max(x0,x1) + grow, max(y0,y1) + grow
+            cells = self.edgeIndex.getSegmentCells((x0,y0,x1,y1),grow)
+            self.edgeIndex.insert(k,box,cells)
+
+    def update(self,modules):
+        """
+        Update the boxes of modules after they have been moved.
+        """
+        for module, box in zip(modules,getModuleBoxes(modules).tolist()):
+            self.moduleIndex.insert(module.ref,box)
+
+    def check(self,refs):
+        """
+        Returns list of the violations involving the modules refs. Each
+        overlapping pair is reported once.
+        """
+        violations = []
+        seen = set()
+        for ref in refs:
+            box = self.moduleIndex.boxes[ref]
+            for otherRef in sorted(self.moduleIndex.query(box)):
+                pair = tuple(sorted((ref,otherRef)))
+                if otherRef == ref or pair in seen:
+                    continue
+                seen.add(pair)
+                violations.append(('overlap', ref, otherRef))
+            for k in sorted(self.edgeIndex.query(box)):
+                segment = self.edgeSegments[k]
+                dist = getSegmentBoxDistance(segment[:4].tolist(),box)
+                if dist < 0.5*segment[4] + self.edgeClearance:
+                    violations.append(('edge', ref, tuple((segment[:4]/10000).tolist())))
+        return violations
+
 
 class ComponentPlacer(object):
 
-    def __init__(self,filename):
+    def __init__(self,filename,lazy=False,cacheSize=DEFAULT_MODULE_CACHE_SIZE,instrument=None,
+            absolute=False,footprints=None):
         """
         Read the file and get list of file lines and dictionary of modules.
+        With lazy=True only the module boundaries are found up front and at
+        most cacheSize parsed modules are kept, see LazyModuleDict. Phase
+        statistics are recorded by instrument if given, see instrument.py.
+
+        With absolute=True module positions are set rather than offset, see
+        setModulePositions. The pad orientations are then taken from the
+        footprints of a footprints.FootprintLibrary, if given, and otherwise
+        from the modules' current pad orientations relative to the module.
         """
         self.filename = filename
+        self.instrument = NULL_INSTRUMENT if instrument is None else instrument
+        self.absolute = absolute
+        self.footprints = footprints
+        self.templatePadAngles = {}
+        self.lazy = lazy
+        self.cacheSize = cacheSize
         self.lines = self.readFile()
-        self.moduleDict = self.getModuleDict()
+        self.modules = self.getModuleDict()
+        self.moduleDict = self.modules
+        self.checker = None
+        self.pendingTracks = []
+        self.numPendingTracks = 0
 
+    @instrumented()
     def readFile(self):
         """
         Read the file and return a list of all lines.
         """
         with open(self.filename,'r') as fid:
             lines = fid.readlines()
+        if self.instrument.enabled:
+            self.instrument.count('readFile',lines=len(lines),bytes=sum(len(line) for line in lines))
         return lines
 
+    @instrumented()
     def getModuleDict(self):
         """
-        Get a dictionary of all modules.
+        Get a dictionary of all modules indexed by reference. Each entry
+        holds the line numbers of the module's Po and pad Sh lines along with
+        their parsed values. In lazy mode the modules are only parsed when
+        they are accessed, see LazyModuleDict.
         """
-        inModule = False
+        self.instrument.count('getModuleDict',lines=len(self.lines))
+        if self.lazy:
+            moduleBounds = getModuleBounds(self.lines)
+            self.instrument.count('getModuleDict',modules=len(moduleBounds))
+            return LazyModuleDict(self.lines,moduleBounds,self.cacheSize)
         moduleDict = {}
-        # Loop over all lines in file
-        for i, line in enumerate(self.lines):
-            splitLine = line.split()
-            if splitLine:
-                if inModule:
-                    # We are in a module get lines, module reference and determine when
-                    # module ends.
-                    moduleLines.append((i,line))
-                    if splitLine[0] == '$EndMODULE':
-                        inModule = False
-                        if moduleRef is not None:
-                            moduleDict[moduleRef] = moduleLines
-                        else:
-                            raise ValueError, 'module has no reference'
-                    else:
-                        if splitLine[0] == 'T0':
-                            moduleRef =  splitLine[-1][2:-1]
-                else:
-                    # We are not in module .. look for module start.
-                    if splitLine[0] == '$MODULE':
-                        inModule = True
-                        moduleLines = [(i,line)]
-                        moduleRef = None
+        numLines = len(self.lines)
+        i = 0
+        while i < numLines:
+            if self.lines[i].startswith('$MODULE'):
+                module = parseModule(self.lines,i)
+                moduleDict[module.ref] = module
+                i = module.end
+            i += 1
+        self.instrument.count('getModuleDict',modules=len(moduleDict))
         return moduleDict
 
+    def enableChecks(self,edgeClearance=0.0,layer='edges_pcb',cellSize=None):
+        """
+        Enable placement checks. Once enabled setModulePos and
+        setModulePositions return a list of the overlaps and edge clearance
+        violations of the moved modules, see PlacementChecker. The clearance
+        to the segments on layer and the optional index cellSize are given in
+        inches.
+        """
+        if cellSize is not None:
+            cellSize = 10000*cellSize
+        edgeSegments = self.getDrawSegments(layer)
+        modules = self.modules.values()
+        self.checker = PlacementChecker(modules,edgeSegments,10000*edgeClearance,cellSize)
+
+    def disableChecks(self):
+        self.checker = None
+
+    def getDrawSegments(self,layer='edges_pcb'):
+        """
+        Returns (N,5) array of the line segments on layer, see getEdgeSegments.
+        """
+        return getEdgeSegments(self.lines,layer)
+
+    def getTemplatePadAngles(self,modules):
+        """
+        Returns array of the pad orientations (0.1 degrees) of the modules'
+        footprints in the unrotated position, for all pads of all modules.
+        """
+        if self.footprints is None:
+            padAngles = [pad.angle - module.pos[2] for module in modules for pad in module.pads]
+            return numpy.array(padAngles,dtype=numpy.int64)%3600
+        padAngles = []
+        for module in modules:
+            footprintName = self.lines[module.start].split()[1]
+            try:
+                footprintAngles = self.templatePadAngles[footprintName]
+            except KeyError:
+                footprint = self.footprints.getFootprint(footprintName)
+                footprintAngles = dict((pad.name, pad.angle) for pad in footprint.pads)
+                self.templatePadAngles[footprintName] = footprintAngles
+            for pad in module.pads:
+                try:
+                    padAngles.append(footprintAngles[pad.name])
+                except KeyError:
+                    raise KeyError, 'footprint, %s, has no pad %s'%(footprintName,pad.name)
+        return numpy.array(padAngles,dtype=numpy.int64)
+
+    @instrumented()
     def setModulePos(self,name,x,y,ang):
         """
         Set position of current modules. The values for x and y should be given in inches and
-        ang in degrees.
-
-        Note, this function should really read the module template form the .mod library file.
+        ang in degrees. Returns the list of placement violations if checks
+        are enabled, see enableChecks. In absolute mode the position is set
+        rather than offset, see setModulePositions.
         """
-        moduleLines = self.moduleDict[name]
+        if self.absolute:
+            return self.setModulePositions([name],x,y,ang)
+        module = self.modules[name]
 
         # Set position of the module itself
-        # 
-        # Note, it might make sense to make rotations relative ... or to read 
-        # The template from the .mod file. 
-        # 
-        posFound = False
-        for moduleIndex, lineData in enumerate(moduleLines):
-            linesIndex, line = lineData
-            splitLine = line.split()
-            if splitLine[0] == 'Po' and len(splitLine) > 3:
-
-                # Get new positions and angle
-                curX = int(splitLine[1])
-                newX = round(curX + 10000*x)
-                curY = int(splitLine[2])
-                newY = round(curY + 10000*y)
-                curAng = int(splitLine[3])
-                newAng = (curAng + round(ang))%3600
-
-                # write new position and angle
-                splitLine[1] = '%d'%(round(newX),)
-                splitLine[2] = '%d'%(round(newY),)
-                splitLine[3] = '%d'%(round(newAng),)
-                for k, val in enumerate(splitLine):
-                    if k == 0:
-                        newLine = '%s'%(val,)
-                    else:
-                        newLine = '%s %s'%(newLine, val)
-                newLine = '%s\n'%(newLine,)
-                self.lines[linesIndex] = newLine
-                moduleLines[moduleIndex] = (linesIndex,newLine)
-                posFound = True
-                break
-        # Check to see if modules was found - this is a kludge
-        if not posFound:
-            raise ValueError, 'module, %s,  position not found'%(name,)
+        curX, curY, curAng = module.pos
+        newX = round(curX + 10000*x)
+        newY = round(curY + 10000*y)
+        newAng = (curAng + round(ang))%3600
+        self.lines[module.posLine] = setPoLine(self.lines[module.posLine],newX,newY,newAng)
+        module.pos = int(newX), int(newY), int(newAng)
 
         # Set position of pads in module
-        for moduleIndex, lineData in enumerate(moduleLines):
-            linesIndex, line = lineData
-            splitLine = line.split()
-            if splitLine[0] == 'Sh':
-                curAng = int(splitLine[-1])
-                newAng = (curAng + round(ang))%3600
-                splitLine[-1] = '%d'%(newAng,)
-                for k, val in enumerate(splitLine):
-                    if k == 0:
-                        newLine = '%s'%(val,)
-                    else:
-                        newLine = '%s %s'%(newLine, val)
-                newLine = '%s\n'%(newLine,)
-                self.lines[linesIndex] = newLine
-                moduleLines[moduleIndex] = (linesIndex,newLine)
+        for pad in module.pads:
+            pad.angle = int((pad.angle + round(ang))%3600)
+            self.lines[pad.line] = setShLine(self.lines[pad.line],pad.angle)
+
+        if self.checker is not None:
+            self.checker.update([module])
+            return self.checker.check([name])
+
+    @instrumented()
+    def setModulePositions(self,names,x,y,ang):
+        """
+        Set positions of many modules at once. The argument names is a
+        sequence of module references and x, y (inches) and ang (0.1 degrees)
+        are arrays, or scalars, giving the offsets for each module as in
+        setModulePos. All missing references are reported together before
+        any module is changed. Returns the list of placement violations if
+        checks are enabled, see enableChecks.
+
+        In absolute mode x, y and ang are the new positions and orientations
+        of the modules, so placing twice gives the same board. The pad
+        orientations are set from the footprints' pad orientations rotated
+        by the module orientations, in one array operation for all pads.
+        """
+        names = list(names)
+        missing = [name for name in names if name not in self.modules]
+        if missing:
+            raise KeyError, ', '.join(missing)
+        if len(set(names)) != len(names):
+            raise ValueError, 'module references must be unique'
+        modules = [self.modules[name] for name in names]
+        num = len(modules)
+        self.instrument.count('setModulePositions',modules=num)
+        if num == 0:
+            return [] if self.checker is not None else None
+
+        # Get new positions and angles
+        x, y, ang = [numpy.broadcast_to(numpy.asarray(v,dtype=float),(num,)) for v in (x,y,ang)]
+        numPads = [len(module.pads) for module in modules]
+        if self.absolute:
+            newX = roundHalfAway(10000*x)
+            newY = roundHalfAway(10000*y)
+            newAng = roundHalfAway(ang)%3600
+            padAngles = self.getTemplatePadAngles(modules)
+            padAngles = (padAngles + numpy.repeat(newAng,numPads))%3600
+        else:
+            pos = numpy.array([module.pos for module in modules],dtype=numpy.int64)
+            newX = roundHalfAway(pos[:,0] + 10000*x)
+            newY = roundHalfAway(pos[:,1] + 10000*y)
+            angIncr = roundHalfAway(ang)
+            newAng = (pos[:,2] + angIncr)%3600
+            padAngles = [pad.angle for module in modules for pad in module.pads]
+            padAngles = (numpy.array(padAngles,dtype=numpy.int64) + numpy.repeat(angIncr,numPads))%3600
+
+        # Write new module and pad lines
+        lines = self.lines
+        padAngles = iter(padAngles.tolist())
+        for module, modX, modY, modAng in zip(modules, newX.tolist(), newY.tolist(), newAng.tolist()):
+            lines[module.posLine] = setPoLine(lines[module.posLine],modX,modY,modAng)
+            module.pos = modX, modY, modAng
+            for pad in module.pads:
+                pad.angle = next(padAngles)
+                lines[pad.line] = setShLine(lines[pad.line],pad.angle)
+
+        if self.checker is not None:
+            self.checker.update(modules)
+            return self.checker.check(names)
+
+    def addTracks(self,coords,width,layer='component',netCodes=0):
+        """
+        Add copper track segments to the board in bulk. The argument coords
+        is an (N,4) array of segment end points (x0, y0, x1, y1) in inches
+        and netCodes the net code of each segment, or one for all. The
+        segments are added to the $TRACK section by write.
+        """
+        layerNum = getLayerNum(layer)
+        coords = numpy.asarray(coords,dtype=float).reshape(-1,4)
+        num = coords.shape[0]
+        if num == 0:
+            return
+        values = numpy.empty((num,7),dtype=numpy.int64)
+        values[:,:4] = roundHalfAway(10000*coords)
+        values[:,4] = round(10000*width)
+        values[:,5] = layerNum
+        values[:,6] = netCodes
+        self.pendingTracks.append((TRACK_TEMPLATE*num)%tuple(values.ravel().tolist()))
+        self.numPendingTracks += num
+
+    def flushTracks(self):
+        """
+        Insert the pending track segments at the end of the $TRACK section
+        and update the Ntrack line.
+        """
+        if not self.pendingTracks:
+            return
+        numTracksLine = None
+        endTrackLine = None
+        for i, line in enumerate(self.lines):
+            if numTracksLine is None and line.startswith('Ntrack'):
+                numTracksLine = i
+            elif line.startswith('$EndTRACK'):
+                endTrackLine = i
+                break
+        if numTracksLine is None:
+            raise ValueError, 'number of tracks Ntrack not found in file %s'%(self.filename,)
+        if endTrackLine is None:
+            raise ValueError, 'track section not found in file %s'%(self.filename,)
+        newLines = ''.join(self.pendingTracks).splitlines(True)
+        self.lines[endTrackLine:endTrackLine] = newLines
+        numTracks = int(self.lines[numTracksLine].split()[1]) + self.numPendingTracks
+        self.lines[numTracksLine] = 'Ntrack %d\n'%(numTracks,)
+        self.pendingTracks = []
+        self.numPendingTracks = 0
 
+    @instrumented()
     def write(self,filename=None):
         """
         Write new .brd file. If filename argument is not specified the
-        same name as the original file will be used.
+        same name as the original file will be used. The file is replaced
+        atomically, see writeFileAtomic.
         """
         if filename is None:
             filename = self.filename
-        with open(filename,'w') as fid:
-            for line in self.lines:
-                fid.write(line)
+        self.flushTracks()
+        writeFileAtomic(filename,self.lines)
+        if self.instrument.enabled:
+            self.instrument.count('write',lines=len(self.lines),bytes=sum(len(line) for line in self.lines))
 
     def printLines(self):
         """
@@ -148,25 +887,138 @@ class ComponentPlacer(object):
             print i, line
 
 
-class SegmentDrawer(object):
+class DrawingMixin(object):
+    """
+    Drawing methods shared by the classes which add segments to a .brd file.
+    Segments are appended to the pendingLines buffer and counted in
+    numPending, the subclass decides how the buffer is added to the file.
+    """
 
-    def __init__(self,filename):
+    def incrNumDrawings(self):
+        """
+        Increment number of pending drawings.
+        """
+        self.numPending += 1
+
+    def addLineSegment(self,x0,y0,x1,y1,width, layer='edges_pcb'):
+        """
+        Add a line segment to the brd file.
+        """
+        layerNum = getLayerNum(layer)
+
+        # Scale values to 1/10000 of and inch
+        _x0 = round(10000*x0)
+        _y0 = round(10000*y0)
+        _x1 = round(10000*x1)
+        _y1 = round(10000*y1)
+        _width = round(10000*width)
+
+        # Add line segment
+        self.pendingLines.append(SEGMENT_TEMPLATE%(_x0, _y0, _x1, _y1, _width, layerNum))
+
+        # Update number of drawings
+        self.incrNumDrawings()
+
+    def addSegments(self, coords, width, layer='edges_pcb'):
+        """
+        Add line segments to the brd file in bulk. The argument coords is an
+        (N,4) array of segment end points (x0, y0, x1, y1) given in inches.
+        Scaling and rounding are done on the whole array and the segments are
+        added as a single formatted chunk.
+        """
+        layerNum = getLayerNum(layer)
+        coords = numpy.asarray(coords,dtype=float).reshape(-1,4)
+        num = coords.shape[0]
+        if num == 0:
+            return
+
+        # Scale values to 1/10000 of and inch
+        values = numpy.empty((num,6),dtype=numpy.int64)
+        values[:,:4] = roundHalfAway(10000*coords)
+        values[:,4] = round(10000*width)
+        values[:,5] = layerNum
+
+        # Add line segments
+        self.pendingLines.append((SEGMENT_TEMPLATE*num)%tuple(values.ravel().tolist()))
+
+        # Update number of drawings
+        self.numPending += num
+
+    def addPolyline(self, points, width, closed=False, layer='edges_pcb'):
+        """
+        Add polyline through the (N,2) array of points (inches). If closed is
+        True a segment joining the last point to the first is also added.
+        """
+        points = numpy.asarray(points,dtype=float).reshape(-1,2)
+        if closed:
+            endPoints = numpy.roll(points,-1,axis=0)
+        else:
+            endPoints = points[1:]
+            points = points[:-1]
+        self.addSegments(numpy.hstack((points,endPoints)),width,layer=layer)
+
+    def addArc(self,n,center,radius,startAng,endAng,width,layer='edges_pcb'):
+        """
+        Add circular arc approximated by n segments. The angles startAng and
+        endAng are given in degrees.
+        """
+        cx, cy = center
+        angRad = numpy.linspace(startAng,endAng,n+1)*numpy.pi/180.0
+        xPoints = cx + radius*numpy.cos(angRad)
+        yPoints = cy + radius*numpy.sin(angRad)
+        self.addPolyline(numpy.column_stack((xPoints,yPoints)),width,layer=layer)
+
+    def addRectangle(self, upperRight, lowerLeft, width, layer='edges_pcb'):
+        """
+        Add rectange to brd file by specifying the upperRight and lowerLeft 
+        corners of the board.
+        """
+        x0, y0 = upperRight
+        x1, y1 = lowerLeft
+        points = [(x0,y0),(x0,y1),(x1,y1),(x1,y0)]
+        self.addPolyline(points,width,closed=True,layer=layer)
+
+    def addCircularNgon(self,n,center,radius,width,rotAng=0,layer='edges_pcb'):
+        """
+        Add circular n-gon where n is the number of sides
+        """
+        cx, cy = center
+        t = numpy.arange(0,n)/float(n)
+        rotAngRad = rotAng*numpy.pi/180.0
+
+        xPoints = cx + radius*numpy.cos(2*numpy.pi*t + rotAngRad)
+        yPoints = cy + radius*numpy.sin(2*numpy.pi*t + rotAngRad)
+        self.addPolyline(numpy.column_stack((xPoints,yPoints)),width,closed=True,layer=layer)
+
+
+class SegmentDrawer(DrawingMixin):
+
+    def __init__(self,filename,instrument=None):
         """
         Read the file and get list of file lines and dictionary of modules.
+        Phase statistics are recorded by instrument if given, see
+        instrument.py.
         """
         self.filename = filename
+        self.instrument = NULL_INSTRUMENT if instrument is None else instrument
         self.lines = self.readFile()
+        self.pendingLines = []
+        self.numPending = 0
         self.getNumDrawings()
         self.getInsertPos()
 
+    @instrumented()
     def readFile(self):
         """
         Read the file and return a list of all lines.
         """
         with open(self.filename,'r') as fid:
             lines = fid.readlines()
+        if self.instrument.enabled:
+            self.instrument.count('readFile',lines=len(lines),bytes=sum(len(line) for line in lines))
         return lines 
 
+    @instrumented()
     def getNumDrawings(self):
         """
         Gets the number of drawings currently in .brd file and line number of
@@ -181,14 +1033,17 @@ class SegmentDrawer(object):
                 self.numDrawings = int(lineSplit[1])
                 self.numDrawingsLine = i
                 found = True
+                self.instrument.count('getNumDrawings',lines=i+1)
                 break
         if not found:
-            raise ValueEror, 'number of drawings Ndraw not found in file %s'%(self.filename,)
+            raise ValueError, 'number of drawings Ndraw not found in file %s'%(self.filename,)
 
+    @instrumented()
     def getInsertPos(self):
         """
         Get line number at which to start segemnet insertion.
         """
+        self.instrument.count('getInsertPos',lines=len(self.lines))
         for i, line in enumerate(self.lines):
             lineSplit = line.split()
             if not lineSplit:
@@ -198,10 +1053,10 @@ class SegmentDrawer(object):
 
     def insertLine(self, lineStr):
         """
-        Insert a line into the brd file
+        Add a line to the pending segment buffer. Pending lines are spliced
+        into the brd file, and counted, by flush.
         """
-        self.lines.insert(self.insertPos,lineStr + '\n')
-        self.insertPos += 1
+        self.pendingLines.append(lineStr + '\n')
 
     def setLine(self, lineNum, lineStr):
         """
@@ -209,91 +1064,764 @@ class SegmentDrawer(object):
         """
         self.lines[lineNum] = lineStr + '\n'
 
-    def incrNumDrawings(self):
+    @instrumented()
+    def flush(self):
         """
-        Increment number of drawings.
+        Splice all pending segments into the file lines at the insertion
+        position and update the Ndraw line once.
         """
-        self.numDrawings += 1
+        if not self.pendingLines:
+            return
+        # Entries added by addSegments hold several lines each
+        newLines = ''.join(self.pendingLines).splitlines(True)
+        self.lines[self.insertPos:self.insertPos] = newLines
+        self.instrument.count('flush',lines=len(newLines),segments=self.numPending)
+        self.insertPos += len(newLines)
+        self.numDrawings += self.numPending
         self.setLine(self.numDrawingsLine,'Ndraw %d'%(self.numDrawings,))
+        self.pendingLines = []
+        self.numPending = 0
 
-    def addLineSegment(self,x0,y0,x1,y1,width, layer='edges_pcb'):
+    @instrumented()
+    def write(self,filename=None):
         """
-        Add a line segment to the brd file.
+        Write new .brd file. If filename argument is not specified the
+        same name as the original file will be used. The file is replaced
+        atomically, see writeFileAtomic.
         """
-        _layer = layer.lower()
-        if _layer == 'edges_pcb':
-            layerNum = 28
-        elif _layer == 'drawing':
-            layerNum = 24
-        elif _layer == 'comments':
-            layerNum = 25
-        else:
-            raise ValueError, 'unknown layer: %s'%(layer,)
+        # Splice in pending segments and update the number of drawings
+        self.flush()
 
-        # Scale values to 1/10000 of and inch
-        _x0 = 10000*x0
-        _y0 = 10000*y0
-        _x1 = 10000*x1
-        _y1 = 10000*y1
-        _width = 10000*width
-        
-        # Add line segment
-        self.insertLine('$DRAWSEGMENT')
-        self.insertLine('Po 0 %d %d %d %d %d'%(_x0, _y0, _x1, _y1, _width))
-        self.insertLine('De %d 0 900 0 0'%(layerNum,))
-        self.insertLine('$EndDRAWSEGMENT')
+        if filename is None:
+            filename = self.filename
+        writeFileAtomic(filename,self.lines)
+        if self.instrument.enabled:
+            self.instrument.count('write',lines=len(self.lines),bytes=sum(len(line) for line in self.lines))
 
-        # Update number of drawings
-        self.incrNumDrawings()
 
-    def addRectangle(self, upperRight, lowerLeft, width, layer='edges_pcb'):
+class Board(ComponentPlacer,DrawingMixin):
+    """
+    Board on which placement, drawing and tracks share one list of file
+    lines and one write, e.g.
+
+        board = Board('ledarray.brd')
+        board.setModulePositions(*layout)
+        board.addRectangle((0.5,0.5),(10.5,5.5),0.015)
+        board.write()
+
+    The file is read once and indexed in one scan, see getSectionIndex.
+    Modules are parsed when accessed, see LazyModuleDict, and drawings,
+    tracks and zones the first time they are asked for. Pending drawings
+    and tracks are spliced into the lines by flush, which keeps the index
+    up to date.
+    """
+
+    def __init__(self,filename,lazy=True,cacheSize=DEFAULT_MODULE_CACHE_SIZE,instrument=None,
+            absolute=False,footprints=None):
+        self.pendingLines = []
+        self.numPending = 0
+        self.sectionCache = {}
+        ComponentPlacer.__init__(self,filename,lazy,cacheSize,instrument,absolute,footprints)
+
+    @instrumented()
+    def getModuleDict(self):
         """
-        Add rectange to brd file by specifying the upperRight and lowerLeft 
-        corners of the board.
+        Index the file's sections and return the dictionary of modules
+        indexed by reference, parsed when accessed in lazy mode and
+        otherwise from the module start lines of the index.
         """
-        x0, y0 = upperRight
-        x1, y1 = lowerLeft
-        self.addLineSegment(x0,y0,x0,y1,width,layer=layer)
-        self.addLineSegment(x0,y1,x1,y1,width,layer=layer)
-        self.addLineSegment(x1,y1,x1,y0,width,layer=layer)
-        self.addLineSegment(x1,y0,x0,y0,width,layer=layer)
+        self.sections, self.moduleBounds, self.countLines = getSectionIndex(self.lines)
+        self.instrument.count('getModuleDict',lines=len(self.lines),modules=len(self.moduleBounds))
+        if self.lazy:
+            return LazyModuleDict(self.lines,self.moduleBounds,self.cacheSize)
+        return dict((ref, parseModule(self.lines,start)) for ref, (start, end) in self.moduleBounds.iteritems())
 
-    def addCircularNgon(self,n,center,radius,width,rotAng=0,layer='edges_pcb'):
+    def getCount(self,key):
         """
-        Add circular n-gon where n is the number of sides
+        Returns the value of count line key of the $GENERAL section, e.g.
+        Ndraw, and its line number.
         """
-        cx, cy = center
-        t = numpy.arange(0,n)/float(n)
-        rotAngRad = rotAng*numpy.pi/180.0
+        try:
+            i = self.countLines[key]
+        except KeyError:
+            raise ValueError, 'number %s not found in file %s'%(key,self.filename)
+        return int(self.lines[i].split()[1]), i
 
-        xPoints = cx + radius*numpy.cos(2*numpy.pi*t + rotAngRad)
-        yPoints = cy + radius*numpy.sin(2*numpy.pi*t + rotAngRad)
+    def getSectionLines(self,name):
+        """
+        Returns list of the lines of each section name, e.g. '$DRAWSEGMENT'
+        or '$CZONE_OUTLINE', including the start and end lines.
+        """
+        return [self.lines[start:end+1] for start, end in self.sections.get(name,[])]
+
+    def getCachedSection(self,key,parse):
+        """
+        Returns the value of parse() cached under key until the lines are
+        changed by insertLines.
+        """
+        try:
+            return self.sectionCache[key]
+        except KeyError:
+            value = parse()
+            self.sectionCache[key] = value
+            return value
+
+    def getDrawSegments(self,layer='edges_pcb'):
+        """
+        Returns (N,5) array of the line segments on layer found in the
+        $DRAWSEGMENT sections, see getEdgeSegments. Pending drawings are
+        not included until flushed.
+        """
+        def parse():
+            lines = [line for sectionLines in self.getSectionLines('$DRAWSEGMENT') for line in sectionLines]
+            return getEdgeSegments(lines,layer)
+        return self.getCachedSection(('$DRAWSEGMENT',getLayerNum(layer)),parse)
+
+    def getTracks(self,name='$TRACK'):
+        """
+        Returns (N,7) array of the (x0, y0, x1, y1, width, layer, net)
+        values of the track segments in section name, '$TRACK' or the
+        '$ZONE' fill segments. Pending tracks are not included until
+        flushed.
+        """
+        def parse():
+            tracks = []
+            for sectionLines in self.getSectionLines(name):
+                for line in sectionLines:
+                    splitLine = line.split()
+                    if not splitLine:
+                        continue
+                    if splitLine[0] == 'Po':
+                        values = [int(val) for val in splitLine[2:7]]
+                    elif splitLine[0] == 'De':
+                        tracks.append(values + [int(splitLine[1]), int(splitLine[3])])
+            return numpy.array(tracks,dtype=numpy.int64).reshape(-1,7)
+        return self.getCachedSection(name,parse)
+
+    def getZoneOutlines(self):
+        """
+        Returns list of the (net name, layer, corners) of the
+        $CZONE_OUTLINE sections, where corners is an (N,2) array of the
+        outline corners.
+        """
+        def parse():
+            zones = []
+            for sectionLines in self.getSectionLines('$CZONE_OUTLINE'):
+                netName = None
+                layerNum = None
+                corners = []
+                for line in sectionLines:
+                    splitLine = line.split()
+                    if not splitLine:
+                        continue
+                    if splitLine[0] == 'ZInfo':
+                        netName = line[line.index('"')+1:line.rindex('"')]
+                    elif splitLine[0] == 'ZLayer':
+                        layerNum = int(splitLine[1])
+                    elif splitLine[0] == 'ZCorner':
+                        corners.append((int(splitLine[1]), int(splitLine[2])))
+                zones.append((netName, layerNum, numpy.array(corners,dtype=numpy.int64).reshape(-1,2)))
+            return zones
+        return self.getCachedSection('$CZONE_OUTLINE',parse)
+
+    def insertLines(self,pos,newLines):
+        """
+        Insert newLines before line pos and update the section index. The
+        new lines are indexed on their own and the index entries after pos
+        are shifted, so the file is not scanned again.
+        """
+        num = len(newLines)
+        if num == 0:
+            return
+        self.lines[pos:pos] = newLines
+        shift = lambda i: i + num if i >= pos else i
+        for ranges in self.sections.itervalues():
+            ranges[:] = [(shift(start), shift(end)) for start, end in ranges]
+        shifted = False
+        for ref, (start, end) in self.moduleBounds.items():
+            if end >= pos:
+                self.moduleBounds[ref] = shift(start), shift(end)
+                shifted = True
+        if shifted:
+            if self.lazy:
+                self.modules.cache.clear()
+            else:
+                for module in self.modules.itervalues():
+                    module.start, module.end, module.posLine = [shift(i) for i in (module.start, module.end, module.posLine)]
+                    for pad in module.pads:
+                        pad.line = shift(pad.line)
+        for key, i in self.countLines.items():
+            self.countLines[key] = shift(i)
+
+        sections, moduleBounds, countLines = getSectionIndex(newLines)
+        for name, ranges in sections.iteritems():
+            ranges = [(start + pos, end + pos) for start, end in ranges]
+            self.sections.setdefault(name,[]).extend(ranges)
+            self.sections[name].sort()
+        for ref, (start, end) in moduleBounds.iteritems():
+            self.moduleBounds[ref] = start + pos, end + pos
+        self.sectionCache = {}
+
+    def setCount(self,key,num):
+        """
+        Add num to the value of count line key of the $GENERAL section.
+        """
+        value, i = self.getCount(key)
+        self.lines[i] = '%s %d\n'%(key,value + num)
+
+    @instrumented()
+    def flush(self):
+        """
+        Splice the pending drawings into the lines after the last module,
+        or the $SETUP section, and the pending tracks at the end of the
+        $TRACK section, updating the Ndraw and Ntrack lines.
+        """
+        if self.pendingLines:
+            self.getCount('Ndraw')
+            ends = [end for name in ('$SETUP', '$MODULE') for start, end in self.sections.get(name,[])]
+            if not ends:
+                raise ValueError, 'drawing position not found in file %s'%(self.filename,)
+            newLines = ''.join(self.pendingLines).splitlines(True)
+            self.insertLines(max(ends)+1,newLines)
+            self.setCount('Ndraw',self.numPending)
+            self.instrument.count('flush',lines=len(newLines),segments=self.numPending)
+            self.pendingLines = []
+            self.numPending = 0
+        if self.pendingTracks:
+            self.getCount('Ntrack')
+            if not self.sections.get('$TRACK'):
+                raise ValueError, 'track section not found in file %s'%(self.filename,)
+            newLines = ''.join(self.pendingTracks).splitlines(True)
+            self.insertLines(self.sections['$TRACK'][-1][1],newLines)
+            self.setCount('Ntrack',self.numPendingTracks)
+            self.instrument.count('flush',lines=len(newLines),tracks=self.numPendingTracks)
+            self.pendingTracks = []
+            self.numPendingTracks = 0
+
+    def flushTracks(self):
+        """
+        Pending tracks and drawings are spliced in together, see flush.
+        """
+        self.flush()
+
+
+def getSectionIndex(lines):
+    """
+    Index the top level sections of a .brd file in one scan. Returns a
+    dictionary of the lists of (start, end) line numbers of each section
+    indexed by name, e.g. '$MODULE', the dictionary of the (start, end) line
+    numbers of the modules indexed by reference and the dictionary of the
+    line numbers of the $GENERAL count lines, e.g. Ndraw, indexed by key.
+    Nested sections, such as the pads of a module, are not indexed.
+    """
+    sections = {}
+    moduleBounds = {}
+    countLines = {}
+    name = None
+    for i, line in enumerate(lines):
+        first = line[:1]
+        if first not in '$TN':
+            continue
+        if first == '$':
+            key = line.split()[0]
+            if name is None:
+                if not key.startswith('$End'):
+                    name = key
+                    endKey = '$end%s'%(name[1:].lower(),)
+                    start = i
+                    moduleRef = None
+            elif key.lower() == endKey:
+                sections.setdefault(name,[]).append((start, i))
+                if name == '$MODULE':
+                    if moduleRef is None:
+                        raise ValueError, 'module has no reference'
+                    moduleBounds[moduleRef] = (start, i)
+                name = None
+        elif name == '$MODULE':
+            if moduleRef is None and line.startswith('T0 '):
+                moduleRef = getModuleRef(line)
+        elif name == '$GENERAL' and first == 'N':
+            countLines[line.split()[0]] = i
+    if name is not None:
+        raise ValueError, 'end of section %s not found'%(name,)
+    return sections, moduleBounds, countLines
+
+
+class MoveRegistry(object):
+    """
+    Registration of module moves for the placers which apply them when the
+    board is written. The moves of each module are kept in order in the
+    moves dictionary and applied by getMovedPos, so repeated moves give the
+    same position as they do for ComponentPlacer.
+    """
+
+    def checkModuleNames(self,names):
+        """
+        Called with the references of the modules to be moved before any
+        move is registered. Does nothing by default.
+        """
+        pass
+
+    def setModulePos(self,name,x,y,ang):
+        """
+        Register a change of position of a module. The values for x and y
+        should be given in inches and ang in 0.1 degrees, see
+        ComponentPlacer.setModulePos.
+        """
+        self.checkModuleNames([name])
+        self.moves.setdefault(name,[]).append((x,y,ang))
+
+    def setModulePositions(self,names,x,y,ang):
+        """
+        Register position changes for many modules at once, see
+        ComponentPlacer.setModulePositions.
+        """
+        names = list(names)
+        self.checkModuleNames(names)
+        num = len(names)
+        x, y, ang = [numpy.broadcast_to(numpy.asarray(v,dtype=float),(num,)).tolist() for v in (x,y,ang)]
+        for name, modX, modY, modAng in zip(names,x,y,ang):
+            self.moves.setdefault(name,[]).append((modX,modY,modAng))
+
+
+class StreamingBrdWriter(MoveRegistry,DrawingMixin):
+    """
+    Single pass .brd rewriter. Module placements and drawing additions are
+    registered up front and applied while the input file is copied to the
+    output, so only one module is held in memory at a time.
+    """
+
+    def __init__(self,filename):
+        self.filename = filename
+        self.moves = {}
+        self.pendingLines = []
+        self.numPending = 0
+
+    def readLines(self):
+        """
+        Generator returning the lines of the input file.
+        """
+        with open(self.filename,'r') as fid:
+            for line in fid:
+                yield line
+
+    def placeModules(self,lines):
+        """
+        Generator applying the registered placements to the modules in lines.
+        Each module is buffered until its $EndMODULE line so that its
+        reference, given by the T0 line, is known.
+        """
+        moduleLines = None
+        for line in lines:
+            if moduleLines is None:
+                if line.startswith('$MODULE'):
+                    moduleLines = [line]
+                else:
+                    yield line
+                continue
+            moduleLines.append(line)
+            if line.startswith('$EndMODULE'):
+                for moduleLine in self.placeModule(moduleLines):
+                    yield moduleLine
+                moduleLines = None
+
+    def placeModule(self,moduleLines):
+        """
+        Apply the registered placement, if any, to the lines of a module.
+        """
+        moduleRef = None
+        for line in moduleLines:
+            if line.startswith('T0 '):
+                moduleRef = getModuleRef(line)
+                break
+        if moduleRef is None:
+            raise ValueError, 'module has no reference'
+        try:
+            moves = self.moves[moduleRef]
+        except KeyError:
+            return moduleLines
+        self.placed.add(moduleRef)
+
+        posFound = False
+        for k, line in enumerate(moduleLines):
+            splitLine = line.split()
+            if not splitLine:
+                continue
+            if splitLine[0] == 'Po' and len(splitLine) > 3 and not posFound:
+                pos = tuple(int(val) for val in splitLine[1:4])
+                newPos, rotation = getMovedPos(pos,moves)
+                moduleLines[k] = setPoLine(line,*newPos)
+                posFound = True
+            elif splitLine[0] == 'Sh':
+                moduleLines[k] = setShLine(line,(int(splitLine[-1]) + rotation)%3600)
+        if not posFound:
+            raise ValueError, 'module, %s,  position not found'%(moduleRef,)
+        return moduleLines
+
+    def addDrawings(self,lines):
+        """
+        Generator updating the Ndraw line and inserting the pending segments
+        directly after the module section, i.e. before the first board level
+        drawing, text, track or zone section.
+        """
+        ndrawFound = False
+        inserted = False
+        for line in lines:
+            if not inserted:
+                if not ndrawFound and line.startswith('Ndraw'):
+                    numDrawings = int(line.split()[1]) + self.numPending
+                    line = 'Ndraw %d\n'%(numDrawings,)
+                    ndrawFound = True
+                elif line.startswith('$') and line.split()[0] in INSERT_BEFORE_SECTIONS:
+                    if not ndrawFound:
+                        raise ValueError, 'number of drawings Ndraw not found in file %s'%(self.filename,)
+                    for pendingLine in self.pendingLines:
+                        yield pendingLine
+                    inserted = True
+            yield line
+        if not inserted:
+            raise ValueError, 'end of board not found in file %s'%(self.filename,)
+
+    def checkPlaced(self,lines):
+        """
+        Generator passing on lines which, once they are exhausted, checks
+        that every module with a registered placement was found.
+        """
+        for line in lines:
+            yield line
+        missing = set(self.moves) - self.placed
+        if missing:
+            raise KeyError, ', '.join(sorted(missing))
 
-        for i in range(0,n):
-            j = (i+1)%n
-            x0 = xPoints[i]
-            y0 = yPoints[i]
-            x1 = xPoints[j]
-            y1 = yPoints[j]
-            self.addLineSegment(x0,y0,x1,y1,width,layer=layer)
-        
     def write(self,filename=None):
         """
-        Write new .brd file. If filename argument is not specified the
-        same name as the original file will be used.
+        Write new .brd file in a single pass over the input. If filename
+        argument is not specified the same name as the original file will be
+        used. The file is replaced atomically, see writeFileAtomic.
+        """
+        if filename is None:
+            filename = self.filename
+        self.placed = set()
+        lines = self.readLines()
+        lines = self.placeModules(lines)
+        lines = self.addDrawings(lines)
+        lines = self.checkPlaced(lines)
+        writeFileAtomic(filename,lines)
+
+
+class MappedBoard(object):
+    """
+    Memory mapped, read only view of a .brd file. Modules are discovered by
+    scanning the mapped bytes for the $MODULE, T0 and $EndMODULE markers and
+    only their byte offsets are recorded, so no lines are copied until a
+    module's text is asked for.
+    """
+
+    def __init__(self,filename):
+        self.filename = filename
+        self.fid = open(filename,'rb')
+        if os.fstat(self.fid.fileno()).st_size > 0:
+            self.buffer = mmap.mmap(self.fid.fileno(),0,access=mmap.ACCESS_READ)
+        else:
+            self.buffer = ''
+        self.modules = self.scanModules()
+
+    def scanModules(self):
+        """
+        Returns dictionary of (start, end) byte offsets of the modules indexed
+        by reference.
+        """
+        buf = self.buffer
+        modules = {}
+        start = None
+        for match in MODULE_MARKER_RE.finditer(buf):
+            marker = match.group(1)
+            pos = match.start(1)
+            if marker == '$MODULE':
+                start = pos
+                moduleRef = None
+            elif start is None:
+                continue
+            elif marker == 'T0 ':
+                moduleRef = getModuleRef(buf[pos:buf.find('\n',pos)])
+            else:
+                if moduleRef is None:
+                    raise ValueError, 'module has no reference'
+                end = buf.find('\n',pos)
+                end = len(buf) if end < 0 else end + 1
+                modules[moduleRef] = (start, end)
+                start = None
+        return modules
+
+    def getModuleText(self,name):
+        """
+        Returns the text of a module.
+        """
+        start, end = self.modules[name]
+        return self.buffer[start:end]
+
+    def close(self):
+        if self.buffer:
+            self.buffer.close()
+        self.fid.close()
+
+
+class IncrementalPlacer(MoveRegistry):
+    """
+    Placer which patches module positions into a .brd file. A
+    sidecar index (filename + '.idx') records, for each module reference, the
+    byte offsets and lengths of the module's Po and pad Sh lines along with
+    their parsed values, so later runs can skip parsing the board.
+
+    The index is valid when the board's size and modification time match
+    the recorded ones. With verify=True the indexed lines are also re-read
+    and checked against the recorded checksum of their contents. If the index is missing or
+    stale the board is parsed in full and the index rebuilt.
+    """
+
+    def __init__(self,filename,verify=False):
+        self.filename = filename
+        self.moves = {}
+        self.index = self.loadIndex(filename,verify)
+        if self.index is None:
+            self.index = self.buildIndex()
+            self.saveIndex(filename)
+        self.modules = self.index['modules']
+
+    def getIndexFileName(self,filename):
+        return '%s.idx'%(filename,)
+
+    def buildIndex(self):
+        """
+        Parse the board and return the index of its modules. Each entry is
+        a list [poOffset, poLength, x, y, ang, pads] where pads is a list of
+        [shOffset, shLength, angle] entries.
+        """
+        modules = {}
+        checksum = 0
+        board = MappedBoard(self.filename)
+        try:
+            for moduleRef, (start, end) in board.modules.iteritems():
+                module = [None, None, None, None, None, []]
+                for match in INDEX_LINE_RE.finditer(board.getModuleText(moduleRef)):
+                    line = match.group(1)
+                    lineOffset = start + match.start(1)
+                    splitLine = line.split()
+                    if splitLine[0] == 'Po':
+                        if module[0] is None and len(splitLine) > 3:
+                            x, y, ang = [int(val) for val in splitLine[1:4]]
+                            module[:5] = lineOffset, len(line), x, y, ang
+                            checksum += getLineChecksum(line)
+                    else:
+                        module[5].append([lineOffset, len(line), int(splitLine[-1])])
+                        checksum += getLineChecksum(line)
+                if module[0] is None:
+                    raise ValueError, 'module, %s,  position not found'%(moduleRef,)
+                modules[moduleRef] = module
+        finally:
+            board.close()
+        return {
+                'version'   : INDEX_VERSION,
+                'modules'   : modules,
+                'checksum'  : checksum%2**32,
+                }
+
+    def getChecksum(self,fid):
         """
+        Returns the checksum of the indexed lines read from fid.
+        """
+        checksum = 0
+        for module in self.modules.itervalues():
+            fid.seek(module[0])
+            checksum += getLineChecksum(fid.read(module[1]))
+            for pad in module[5]:
+                fid.seek(pad[0])
+                checksum += getLineChecksum(fid.read(pad[1]))
+        return checksum%2**32
+
+    def loadIndex(self,filename,verify=False):
+        """
+        Load the sidecar index of filename. Returns None if there is no
+        index, it does not match the board or it cannot be loaded for any
+        reason, e.g. a truncated or corrupt file, so the index is rebuilt.
+        """
+        indexFileName = self.getIndexFileName(filename)
+        stat = os.stat(filename)
+        try:
+            with open(indexFileName,'rb') as fid:
+                index = cPickle.load(fid)
+            if index.get('version') != INDEX_VERSION:
+                return None
+            if (index['size'], index['mtime']) != (stat.st_size, stat.st_mtime):
+                return None
+            if verify:
+                self.modules = index['modules']
+                with open(filename,'rb') as fid:
+                    if self.getChecksum(fid) != index['checksum']:
+                        return None
+        except Exception:
+            return None
+        return index
 
-        # Update the number of drawings
+    def saveIndex(self,filename):
+        """
+        Save the index as the sidecar index of filename.
+        """
+        stat = os.stat(filename)
+        self.index['size'] = stat.st_size
+        self.index['mtime'] = stat.st_mtime
+        indexFileName = self.getIndexFileName(filename)
+        with open(indexFileName,'wb') as fid:
+            cPickle.dump(self.index,fid,cPickle.HIGHEST_PROTOCOL)
 
+    def checkModuleNames(self,names):
+        """
+        Raise KeyError listing all names which are not modules of the board.
+        """
+        missing = [name for name in names if name not in self.modules]
+        if missing:
+            raise KeyError, ', '.join(missing)
+
+    def getChanges(self,fid):
+        """
+        Returns sorted list of (offset, oldLine, newLine) for the lines changed
+        by the registered moves and updates the indexed values. Raises
+        ValueError if a line read from fid does not hold the indexed values.
+        """
+        changes = []
+        for name, moves in self.moves.iteritems():
+            module = self.modules[name]
+            poOffset, poLength, curX, curY, curAng, pads = module
+            fid.seek(poOffset)
+            line = fid.read(poLength)
+            splitLine = line.split()
+            if splitLine[:1] != ['Po'] or [int(val) for val in splitLine[1:4]] != [curX, curY, curAng]:
+                raise ValueError, 'index of module, %s, does not match file'%(name,)
+            (newX, newY, newAng), rotation = getMovedPos((curX,curY,curAng),moves)
+            changes.append((poOffset, line, setPoLine(line,newX,newY,newAng)))
+            module[2:5] = newX, newY, newAng
+            for pad in pads:
+                shOffset, shLength, padAng = pad
+                fid.seek(shOffset)
+                line = fid.read(shLength)
+                splitLine = line.split()
+                if splitLine[:1] != ['Sh'] or int(splitLine[-1]) != padAng:
+                    raise ValueError, 'index of module, %s, does not match file'%(name,)
+                pad[2] = (padAng + rotation)%3600
+                changes.append((shOffset, line, setShLine(line,pad[2])))
+        changes.sort()
+        checksum = self.index['checksum']
+        for offset, oldLine, newLine in changes:
+            checksum += getLineChecksum(newLine) - getLineChecksum(oldLine)
+        self.index['checksum'] = checksum%2**32
+        return changes
+
+    def write(self,filename=None,inPlace=False):
+        """
+        Apply the registered moves. If filename argument is not specified
+        the original file is replaced, see writeFileAtomic, by copying the
+        unchanged byte ranges around the changed lines into a new file.
+
+        With inPlace=True the changed lines of the original file are
+        overwritten instead when every changed line keeps its length. This
+        avoids copying the board but is not atomic: an interrupted write
+        leaves some lines moved and others not, e.g. a module moved without
+        its pads rotated, and the next run applies the moves again.
+        """
         if filename is None:
             filename = self.filename
-        with open(filename,'w') as fid:
-            for line in self.lines:
-                fid.write(line)
+        with open(self.filename,'rb') as fid:
+            changes = self.getChanges(fid)
+        sameFile = os.path.abspath(filename) == os.path.abspath(self.filename)
+        sameLength = all(len(oldLine) == len(newLine) for offset, oldLine, newLine in changes)
+        if inPlace and sameFile and sameLength:
+            with open(filename,'r+b') as fid:
+                for offset, oldLine, newLine in changes:
+                    fid.seek(offset)
+                    fid.write(newLine)
+        else:
+            self.spliceChanges(changes,filename)
+        self.moves = {}
+        self.filename = filename
+        self.saveIndex(filename)
+
+    def spliceChanges(self,changes,filename):
+        """
+        Write the board with changes applied to filename by copying the
+        unchanged byte ranges, and shift the indexed offsets accordingly.
+        """
+        def getChunks(fid):
+            pos = 0
+            for offset, oldLine, newLine in changes:
+                for chunk in readRange(fid,pos,offset):
+                    yield chunk
+                yield newLine
+                pos = offset + len(oldLine)
+            for chunk in readRange(fid,pos,None):
+                yield chunk
+        with open(self.filename,'rb') as fid:
+            writeFileAtomic(filename,getChunks(fid),mode='wb')
+
+        # Shift offsets by the change in length of the preceding lines
+        changeOffsets = [offset for offset, oldLine, newLine in changes]
+        shifts = [0]
+        for offset, oldLine, newLine in changes:
+            shifts.append(shifts[-1] + len(newLine) - len(oldLine))
+        newLengths = dict((offset,len(newLine)) for offset, oldLine, newLine in changes)
+        def shift(entry):
+            offset = entry[0]
+            if offset in newLengths:
+                entry[1] = newLengths[offset]
+            entry[0] = offset + shifts[bisect.bisect_left(changeOffsets,offset)]
+        for module in self.modules.itervalues():
+            shift(module)
+            for pad in module[5]:
+                shift(pad)
+
+
+LAYER_NUMS = {
+        'copper'    : 0,
+        'component' : 15,
+        'edges_pcb' : 28,
+        'drawing'   : 24,
+        'comments'  : 25,
+        }
+
+# Smallest grid cell size used by PlacementChecker (1/10000 inch)
+DEFAULT_CHECK_CELL_SIZE = 100
+
+SEGMENT_TEMPLATE = '$DRAWSEGMENT\nPo 0 %d %d %d %d %d\nDe %d 0 900 0 0\n$EndDRAWSEGMENT\n'
+
+# Track segment in the $TRACK section. Arguments: x0, y0, x1, y1, width,
+# layer, net code
+TRACK_TEMPLATE = 'Po 0 %d %d %d %d %d -1\nDe %d 0 %d 0 0\n'
+
+# Markers are matched with their preceding newline, which lets the regex
+# engine search for the newline quickly. Neither a board nor a module starts
+# with one of these lines.
+MODULE_MARKER_RE = re.compile(r'\n(\$MODULE|\$EndMODULE|T0 )')
+
+INDEX_LINE_RE = re.compile(r'\n((?:Po|Sh) [^\n]*\n?)')
+
+# Increment when the IncrementalPlacer index format changes
+INDEX_VERSION = 1
+
+INSERT_BEFORE_SECTIONS = (
+        '$DRAWSEGMENT',
+        '$TEXTPCB',
+        '$COTATION',
+        '$MIREPCB',
+        '$PCB_TARGET',
+        '$TRACK',
+        '$ZONE',
+        '$CZONE_OUTLINE',
+        '$EndBOARD',
+        )
+
 
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
-    import math
+    import layouts
 
     if 0:
         xNum = 2 
@@ -304,13 +1832,8 @@ if __name__ == '__main__':
         yStep = 0.3691
 
         placer = ComponentPlacer('ledarray.brd')
-        for i in range(0,xNum):
-            for j in range(0,yNum):
-                name = 'D%d,%d'%(j,i)
-                x = xStart + i*xStep
-                y = yStart + j*yStep
-                ang = 900 
-                placer.setModulePos(name,x,y,ang)
+        layout = layouts.gridLayout(yNum,xNum,(xStart,yStart),(xStep,yStep),ang=900)
+        placer.setModulePositions(*layout)
         placer.write()
 
     if 0:
@@ -321,12 +1844,8 @@ if __name__ == '__main__':
         radius = 2.0
 
         placer = ComponentPlacer('ledarray.brd')
-        for i in range(0,xNum):
-            ang = 3600*(float(i)/float(xNum))
-            name = 'D%d,%d'%(0,i)
-            x = xStart + 2.0*math.cos(ang*math.pi/1800)
-            y = yStart - 2.0*math.sin(ang*math.pi/1800)
-            placer.setModulePos(name,x,y,ang)
+        layout = layouts.circleLayout(xNum,(xStart,yStart),radius)
+        placer.setModulePositions(*layout)
         placer.write()
 
     if 1:
@@ -375,16 +1894,12 @@ if __name__ == '__main__':
         yStart = int(yCornerRough + yCenter) - yCenter
 
         placer = ComponentPlacer(board_filename)
-        for h in range(0,int(xNum_output/xNum_input)):
-            xLow = h*xNum_input
-            xHigh = xLow + xNum_input
-            for i in range(xLow,xHigh):
-                for j in range(0,yNum_output):
-                    name0 = j + h*yNum_output
-                    name1 = i - h*xNum_input
-                    name = 'D%d,%d'%(name0,name1)
-                    x = xStart + i*xStep
-                    y = yStart + j*yStep
-                    ang = 0
-                    placer.setModulePos(name,x,y,ang)
+        layout = layouts.panelLayout(
+                int(xNum_output/xNum_input), 1,
+                yNum_output, xNum_input,
+                (xStart,yStart),
+                (xStep,yStep),
+                (xNum_input*xStep,0),
+                )
+        placer.setModulePositions(*layout)
         placer.write()
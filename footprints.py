@@ -0,0 +1,279 @@
+"""
+Copyright 2010  IO Rodeo Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Footprints read from pcbnew .mod library files. Parsed libraries are
+cached in a pickled sidecar file (library + '.pkl') which is used as long as
+the library's size and modification time are unchanged, e.g.
+
+    library = loadProjectLibrary('ledarray.pro',['/usr/share/kicad/modules'])
+    footprint = library.getFootprint('LED-3MM')
+"""
+from __future__ import division
+import os
+import cPickle
+import cStringIO
+import ConfigParser
+import collections
+import brd_tools
+
+
+def readModFile(filename):
+    """
+    Read a .mod library file and return an ordered dictionary of the lines
+    of each module, from $MODULE to $EndMODULE, indexed by module name.
+    """
+    modules = collections.OrderedDict()
+    moduleLines = None
+    with open(filename,'r') as fid:
+        for line in fid:
+            if moduleLines is None:
+                if line.startswith('$MODULE'):
+                    name = line.split()[1]
+                    moduleLines = [line]
+                continue
+            moduleLines.append(line)
+            if line.startswith('$EndMODULE'):
+                modules[name] = moduleLines
+                moduleLines = None
+    if moduleLines is not None:
+        raise ValueError, 'end of module %s not found in file %s'%(name,filename)
+    return modules
+
+
+class Footprint(object):
+    """
+    Module template parsed from the lines of a library module. The lines
+    are turned into a format template for a complete board $MODULE block,
+    see getModuleValues for its arguments. Pad offsets are kept relative to
+    the module, as pcbnew does, while pad orientations are absolute so they
+    are set from the module orientation.
+
+    The parsed pads (brd_tools.Pad entries), outline shapes as (key,
+    values) and texts as (field number, text) are kept for geometry
+    calculations.
+    """
+
+    def __init__(self,lines):
+        self.name = lines[0].split()[1]
+        self.layer = 15
+        self.attributes = '~~'
+        self.pads = []
+        self.shapes = []
+        self.texts = []
+        templateLines = []
+        timeStampPos = None
+        pad = None
+        inShape3D = False
+        for line in lines:
+            splitLine = line.split()
+            key = splitLine[0] if splitLine else ''
+            if inShape3D:
+                # 3D model lines, including its Sc scale line, are kept as is
+                templateLines.append(line.replace('%','%%'))
+                if key == '$EndSHAPE3D':
+                    inShape3D = False
+                continue
+            if key == '$SHAPE3D':
+                inShape3D = True
+                templateLines.append(line.replace('%','%%'))
+                continue
+            if key in ('Sc', 'AR') and pad is None:
+                # Replaced by the module's timestamps
+                continue
+            if key.startswith('T') and key[1:].isdigit():
+                start = line.rindex('"',0,line.rindex('"'))
+                self.texts.append((int(key[1:]),line[start+1:line.rindex('"')]))
+                if key in ('T0', 'T1'):
+                    # Replace the text between the last pair of quotes
+                    templateLines.append('%s"%%s"\n'%(line[:start].replace('%','%%'),))
+                    continue
+            elif key in SHAPE_KEYS:
+                self.shapes.append((key,tuple(int(val) for val in splitLine[1:])))
+            if key == 'Po' and pad is None and len(splitLine) > 3:
+                self.layer = int(splitLine[4])
+                self.attributes = splitLine[7] if len(splitLine) > 7 else '~~'
+                templateLines.append('Po %%d %%d %%d %d %%08X %%08X %s\n'%(self.layer,self.attributes))
+            else:
+                templateLines.append(line.replace('%','%%'))
+            if key in ('Po', 'Li', 'Cd', 'Kw') and pad is None:
+                timeStampPos = len(templateLines)
+            elif key == '$PAD':
+                pad = brd_tools.Pad(None,None,0,(0,0))
+            elif key == 'Sh' and pad is not None:
+                pad.name = splitLine[1][1:-1]
+                pad.size = int(splitLine[-5]), int(splitLine[-4])
+                pad.angle = int(splitLine[-1])
+                text = templateLines.pop().rsplit(' ',1)[0]
+                templateLines.append('%s %%d\n'%(text,))
+            elif key == 'Po' and pad is not None:
+                pad.offset = int(splitLine[1]), int(splitLine[2])
+            elif key == '$EndPAD':
+                self.pads.append(pad)
+                pad = None
+        if timeStampPos is None:
+            raise ValueError, 'module, %s, position not found'%(self.name,)
+        templateLines.insert(timeStampPos,'Sc %08X\nAR /%08X\n')
+        self.template = ''.join(templateLines)
+
+    def getModuleValues(self,refs,x,y,ang,timeStamps,value):
+        """
+        Returns list of the template argument tuples for modules with
+        references refs at x, y (1/10000 inch) with orientation ang (0.1
+        degrees). The arguments are the position and orientation, the
+        timestamp four times, the reference and value and the orientation
+        of each pad.
+        """
+        padAngles = [pad.angle for pad in self.pads]
+        values = []
+        for ref, modX, modY, modAng, timeStamp in zip(refs,x,y,ang,timeStamps):
+            values.append(
+                    (modX, modY, modAng, timeStamp, timeStamp, timeStamp, timeStamp, ref, value)
+                    + tuple((padAng + modAng)%3600 for padAng in padAngles)
+                    )
+        return values
+
+
+def getCacheFileName(filename):
+    return '%s.pkl'%(filename,)
+
+
+def loadModFile(filename,useCache=True):
+    """
+    Returns ordered dictionary of the Footprints of the .mod library
+    filename indexed by name. If useCache is True the footprints are taken
+    from the library's cache file when it is up to date, otherwise the
+    library is parsed and the cache written. Failure to write the cache,
+    e.g. for a read only library directory, is ignored.
+    """
+    stat = os.stat(filename)
+    cacheFileName = getCacheFileName(filename)
+    if useCache:
+        try:
+            with open(cacheFileName,'rb') as fid:
+                cache = cPickle.load(fid)
+            if (cache['version'], cache['size'], cache['mtime']) == (FOOTPRINT_CACHE_VERSION, stat.st_size, stat.st_mtime):
+                return cache['footprints']
+        except (IOError, EOFError, KeyError, TypeError, cPickle.UnpicklingError):
+            pass
+    footprints = collections.OrderedDict()
+    for name, lines in readModFile(filename).iteritems():
+        footprints[name] = Footprint(lines)
+    if useCache:
+        cache = {
+                'version'       : FOOTPRINT_CACHE_VERSION,
+                'size'          : stat.st_size,
+                'mtime'         : stat.st_mtime,
+                'footprints'    : footprints,
+                }
+        try:
+            with open(cacheFileName,'wb') as fid:
+                cPickle.dump(cache,fid,cPickle.HIGHEST_PROTOCOL)
+        except (IOError, OSError):
+            pass
+    return footprints
+
+
+def loadFootprint(filename,name,useCache=True):
+    """
+    Returns the Footprint of module name of the .mod library filename.
+    """
+    footprints = loadModFile(filename,useCache)
+    try:
+        return footprints[name]
+    except KeyError:
+        raise KeyError, 'module %s not found in library %s'%(name,filename)
+
+
+class FootprintLibrary(object):
+    """
+    Set of .mod libraries searched in order for footprints, as pcbnew does
+    with a project's library list. Library names without a .mod extension
+    are looked up in libDirs. Each library is loaded, see loadModFile, the
+    first time it is searched.
+    """
+
+    def __init__(self,libNames,libDirs=('.',),useCache=True):
+        self.libNames = list(libNames)
+        self.libDirs = list(libDirs)
+        self.useCache = useCache
+        self.libraries = {}
+
+    def getLibFileName(self,libName):
+        """
+        Returns the file name of library libName.
+        """
+        if not libName.endswith('.mod'):
+            libName = '%s.mod'%(libName,)
+        for libDir in self.libDirs:
+            filename = os.path.join(libDir,libName)
+            if os.path.exists(filename):
+                return filename
+        raise IOError, 'library %s not found'%(libName,)
+
+    def getLibrary(self,libName):
+        """
+        Returns dictionary of the Footprints of library libName.
+        """
+        try:
+            return self.libraries[libName]
+        except KeyError:
+            footprints = loadModFile(self.getLibFileName(libName),self.useCache)
+            self.libraries[libName] = footprints
+            return footprints
+
+    def getFootprint(self,name):
+        """
+        Returns the Footprint of module name from the first library holding
+        it.
+        """
+        for libName in self.libNames:
+            footprints = self.getLibrary(libName)
+            if name in footprints:
+                return footprints[name]
+        raise KeyError, 'module %s not found in libraries %s'%(name,', '.join(self.libNames))
+
+
+def loadProjectLibrary(proFileName,libDirs=()):
+    """
+    Returns the FootprintLibrary of the libraries listed in the
+    [pcbnew/libraries] section of a pcbnew project file. Libraries are
+    looked up in the project's LibDir, the project directory and libDirs.
+    """
+    config = ConfigParser.RawConfigParser()
+    config.optionxform = str
+    with open(proFileName,'r') as fid:
+        text = fid.read()
+    # Skip the lines before the first section
+    config.readfp(cStringIO.StringIO(text[max(text.find('\n['),0):]))
+    section = 'pcbnew/libraries'
+    libNames = []
+    k = 1
+    while config.has_option(section,'LibName%d'%(k,)):
+        libNames.append(config.get(section,'LibName%d'%(k,)))
+        k += 1
+    projectDir = os.path.dirname(os.path.abspath(proFileName))
+    searchDirs = []
+    if config.has_option(section,'LibDir') and config.get(section,'LibDir'):
+        searchDirs.append(os.path.join(projectDir,config.get(section,'LibDir')))
+    searchDirs.append(projectDir)
+    searchDirs.extend(libDirs)
+    return FootprintLibrary(libNames,searchDirs)
+
+
+# Increment when changes to Footprint change the cached data
+FOOTPRINT_CACHE_VERSION = 2
+
+# Module outline shapes: segment, circle, arc and polygon
+SHAPE_KEYS = ('DS', 'DC', 'DA', 'DP')
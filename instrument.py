@@ -0,0 +1,178 @@
+"""
+Copyright 2010  IO Rodeo Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Opt-in per-phase instrumentation for the board tools and schematic
+generators. Objects which support it take an instrument argument and record
+the wall time and number of calls of each phase, along with counters such
+as lines and bytes, e.g.
+
+    instrument = Instrument()
+    placer = ComponentPlacer('ledarray.brd',instrument=instrument)
+    placer.setModulePositions(*layout)
+    placer.write()
+    instrument.writeJSON('placer_stats.json')
+
+Without an instrument the objects use NULL_INSTRUMENT, which is disabled
+and costs one attribute check per instrumented call.
+"""
+from __future__ import division
+import time
+import json
+import functools
+import collections
+
+
+class Phase(object):
+    """
+    Context manager adding the wall time of its block to a phase of an
+    Instrument and counting the call.
+    """
+
+    def __init__(self,instrument,name):
+        self.instrument = instrument
+        self.name = name
+
+    def __enter__(self):
+        self.startTime = time.time()
+        return self
+
+    def __exit__(self,excType,excValue,traceback):
+        stats = self.instrument.getPhaseStats(self.name)
+        stats['time'] += time.time() - self.startTime
+        stats['calls'] += 1
+        return False
+
+
+class NullPhase(object):
+    """
+    Context manager which does nothing, returned by a disabled Instrument.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,excType,excValue,traceback):
+        return False
+
+
+class Instrument(object):
+    """
+    Records the wall time, call count and counters of named phases. Phases
+    nest, so the time of a phase includes the time of the phases it calls.
+    A disabled instrument records nothing.
+    """
+
+    def __init__(self,enabled=True):
+        self.enabled = enabled
+        self.phases = collections.OrderedDict()
+
+    def getPhaseStats(self,name):
+        """
+        Returns the statistics dictionary of phase name, creating it if
+        needed.
+        """
+        try:
+            return self.phases[name]
+        except KeyError:
+            stats = collections.OrderedDict([('time', 0.0), ('calls', 0)])
+            self.phases[name] = stats
+            return stats
+
+    def phase(self,name):
+        """
+        Returns context manager recording the block as a call of phase name.
+        """
+        if not self.enabled:
+            return NULL_PHASE
+        return Phase(self,name)
+
+    def count(self,name,**counters):
+        """
+        Add the keyword counters, e.g. lines=10, to the counters of phase
+        name.
+        """
+        if not self.enabled:
+            return
+        stats = self.getPhaseStats(name)
+        for counter, value in counters.iteritems():
+            stats[counter] = stats.get(counter,0) + value
+
+    def countFile(self,name,filename,chunkSize=2**20):
+        """
+        Add the number of lines and bytes of filename to the counters of
+        phase name.
+        """
+        if not self.enabled:
+            return
+        numLines = 0
+        numBytes = 0
+        with open(filename,'rb') as fid:
+            while True:
+                data = fid.read(chunkSize)
+                if not data:
+                    break
+                numLines += data.count('\n')
+                numBytes += len(data)
+        self.count(name,lines=numLines,bytes=numBytes)
+
+    def reset(self):
+        self.phases = collections.OrderedDict()
+
+    def getStats(self):
+        """
+        Returns dictionary of the statistics of all phases in the order they
+        were first recorded.
+        """
+        return collections.OrderedDict((name, collections.OrderedDict(stats)) for name, stats in self.phases.iteritems())
+
+    def toJSON(self,indent=2):
+        return json.dumps(self.getStats(),indent=indent)
+
+    def writeJSON(self,filename,indent=2):
+        with open(filename,'w') as fid:
+            fid.write(self.toJSON(indent))
+            fid.write('\n')
+
+    def printStats(self):
+        """
+        Prints table of the phase statistics.
+        """
+        print '  %-24s %8s %12s  %s'%('phase', 'calls', 'time (s)', 'counters')
+        for name, stats in self.phases.iteritems():
+            counters = ', '.join('%s=%d'%(k,v) for k,v in stats.iteritems() if k not in ('time','calls'))
+            print '  %-24s %8d %12.4f  %s'%(name, stats['calls'], stats['time'], counters)
+
+
+def instrumented(name=None):
+    """
+    Method decorator recording each call of the method as a call of phase
+    name (the method name by default) of the object's instrument attribute.
+    """
+    def decorator(method):
+        phaseName = method.__name__ if name is None else name
+        @functools.wraps(method)
+        def wrapper(self,*args,**kwargs):
+            instrument = self.instrument
+            if not instrument.enabled:
+                return method(self,*args,**kwargs)
+            with Phase(instrument,phaseName):
+                return method(self,*args,**kwargs)
+        return wrapper
+    return decorator
+
+
+NULL_PHASE = NullPhase()
+
+NULL_INSTRUMENT = Instrument(enabled=False)
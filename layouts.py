@@ -0,0 +1,110 @@
+"""
+Copyright 2010  IO Rodeo Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Parametric layout generators. Each function returns a tuple (refs, x, y, ang)
+where refs is a list of module references, x and y are arrays of positions in
+inches and ang is an array of angles in 0.1 degrees, so that a layout can be
+passed directly to ComponentPlacer.setModulePositions, e.g.
+
+    placer.setModulePositions(*gridLayout(10,10,(1.0,1.0),(0.3691,0.3691)))
+
+References are built from refFormat using the (row, column) index of each
+component, matching the 'D%d,%d' references used by the schematic generators.
+"""
+from __future__ import division
+import numpy
+
+
+def getRefs(refFormat,rows,cols):
+    """
+    Returns list of references built from refFormat and the row and column
+    index arrays.
+    """
+    return [refFormat%(i,j) for i, j in zip(rows.tolist(),cols.tolist())]
+
+
+def gridLayout(numRows,numCols,start,step,ang=0,refFormat='D%d,%d'):
+    """
+    Rectangular grid of numRows x numCols components with the first component
+    at start = (x,y) and spacing step = (dx,dy). Rows run along y and columns
+    along x.
+    """
+    rows, cols = numpy.mgrid[0:numRows,0:numCols]
+    rows, cols = rows.ravel(), cols.ravel()
+    x = start[0] + cols*step[0]
+    y = start[1] + rows*step[1]
+    ang = numpy.zeros(x.shape) + ang
+    return getRefs(refFormat,rows,cols), x, y, ang
+
+
+def circleLayout(num,center,radius,startAng=0,row=0,refFormat='D%d,%d'):
+    """
+    Circular ring of num components about center with the given radius. The
+    components are rotated to follow the ring and have references in the
+    given row. The angle startAng of the first component is in 0.1 degrees.
+    """
+    cols = numpy.arange(num)
+    ang = startAng + 3600*cols/num
+    angRad = ang*numpy.pi/1800
+    x = center[0] + radius*numpy.cos(angRad)
+    y = center[1] - radius*numpy.sin(angRad)
+    rows = numpy.zeros(cols.shape,dtype=int) + row
+    return getRefs(refFormat,rows,cols), x, y, ang
+
+
+def hexLayout(numRows,numCols,start,pitch,ang=0,refFormat='D%d,%d'):
+    """
+    Hexagonal packing of numRows x numCols components with center to center
+    distance pitch. Odd rows are shifted by half a pitch along x.
+    """
+    rows, cols = numpy.mgrid[0:numRows,0:numCols]
+    rows, cols = rows.ravel(), cols.ravel()
+    x = start[0] + (cols + 0.5*(rows%2))*pitch
+    y = start[1] + rows*pitch*numpy.sqrt(3)/2
+    ang = numpy.zeros(x.shape) + ang
+    return getRefs(refFormat,rows,cols), x, y, ang
+
+
+def spiralLayout(num,center,pitch,spacing,ang=0,row=0,refFormat='D%d,%d'):
+    """
+    Archimedean spiral of num components about center. The turns of the
+    spiral are pitch apart and successive components are approximately
+    spacing apart along the spiral.
+    """
+    cols = numpy.arange(num)
+    b = pitch/(2*numpy.pi)
+    theta = numpy.sqrt(2*cols*spacing/b)
+    x = center[0] + b*theta*numpy.cos(theta)
+    y = center[1] - b*theta*numpy.sin(theta)
+    ang = numpy.zeros(x.shape) + ang
+    rows = numpy.zeros(cols.shape,dtype=int) + row
+    return getRefs(refFormat,rows,cols), x, y, ang
+
+
+def panelLayout(numBlocksX,numBlocksY,numRows,numCols,start,step,blockStep,ang=0,refFormat='D%d,%d'):
+    """
+    Panel of numBlocksX x numBlocksY grid blocks, each numRows x numCols, with
+    blocks spaced by blockStep = (dx,dy). Blocks are numbered along x first
+    and the rows of block b are referenced as rows b*numRows to
+    (b+1)*numRows-1, the same numbering used by LEDSchemMultiArray.
+    """
+    blocksY, blocksX, rows, cols = numpy.mgrid[0:numBlocksY,0:numBlocksX,0:numRows,0:numCols]
+    blocksY, blocksX = blocksY.ravel(), blocksX.ravel()
+    rows, cols = rows.ravel(), cols.ravel()
+    x = start[0] + blocksX*blockStep[0] + cols*step[0]
+    y = start[1] + blocksY*blockStep[1] + rows*step[1]
+    ang = numpy.zeros(x.shape) + ang
+    refRows = rows + (blocksY*numBlocksX + blocksX)*numRows
+    return getRefs(refFormat,refRows,cols), x, y, ang
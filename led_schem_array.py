@@ -15,40 +15,70 @@ limitations under the License.
 """
 from __future__ import division
 import os.path
-import time
+import numpy
+from schem_tools import SchemGenerator, ChunkWriter, getArrayWireText
+from schem_tools import TimeStampAllocator
+from schem_tools import ComponentStore
+from schem_tools import LED_TEMPLATE
+from instrument import instrumented
+from netlist import Netlist, addLEDArray
 
-class LEDSchemArray(object):
+# Increment when changes to the generator change its output
+GENERATOR_VERSION = 2
 
-    def __init__(self, params):
+class LEDSchemArray(SchemGenerator):
+
+    generatorVersion = GENERATOR_VERSION
+
+    def __init__(self, params, instrument=None):
+        """
+        Set up the generator from the params dictionary. Phase statistics
+        are recorded by instrument if given, see instrument.py.
+        """
         self.LEDWireOffset = 200
-        # Add parameters as attributes
-        for k,v in params.iteritems():
-            setattr(self, k, v)
+        SchemGenerator.__init__(self, params, instrument)
         self.headerTemplate = HEADER_TEMPLATE
-        self.schFileName = '%s.sch'%(self.name,)
-        self.cmpFileName = '%s.cmp'%(self.name,)
-        self.cacheFileName = '%s.cache'%(self.name,)
-        self.ledData = {}
+        self.setComponentSink(ComponentStore())
 
     def getLEDPos(self):
-        ledPos = {}
-        for i in range(self.numParallel):
-            for j in range(self.numSeries):
-                x = self.upperLeft[0] + j*self.spacing[0]
-                y = self.upperLeft[1] + i*self.spacing[1]
-                ledPos[(i,j)] = (x,y)
-        return ledPos
-
-    def write(self):
-        self.writeSchFile()
-        self.writeCmpFile()
+        """
+        Returns (numParallel, numSeries, 2) array of the LED positions.
+        """
+        i = numpy.arange(self.numParallel).reshape(-1,1)
+        j = numpy.arange(self.numSeries).reshape(1,-1)
+        x = self.upperLeft[0] + j*self.spacing[0]
+        y = self.upperLeft[1] + i*self.spacing[1]
+        return numpy.dstack(numpy.broadcast_arrays(x,y))
+
+    def getNetlist(self):
+        """
+        Returns the Netlist of the schematic.
+        """
+        netlist = Netlist()
+        ledKind = netlist.addKind('D%d,%d','LED',self.module)
+        addLEDArray(netlist,ledKind,self.numParallel,self.numSeries)
+        return netlist
+
+    def setComponentSink(self,sink):
+        """
+        Set the object the components are passed to as they are written to
+        the schematic and register the component kinds with it.
+        """
+        self.components = sink
+        self.ledKind = sink.addKind('D%d,%d','LED',self.module)
 
+    @instrumented()
     def writeSchFile(self):
-        with open(self.schFileName,'w') as self.schFid:
+        self.timeStamps = TimeStampAllocator(self.timeStampSeed)
+        with open(self.schFileName,'w') as fid:
+            self.schFid = ChunkWriter(fid,self.flushSize)
             self.writeHeader()
-            self.writeArrayWires()
-            self.writeLEDArray()
+            ledPos = self.getLEDPos()
+            self.writeArrayWires(ledPos)
+            self.writeLEDArray(ledPos)
             self.writeFooter()
+            self.schFid.flush()
+        self.instrument.countFile('writeSchFile',self.schFileName)
 
     def writeHeader(self):
         header = self.headerTemplate.replace('CACHEFILE_MARKER', self.cacheFileName)
@@ -57,119 +87,40 @@ class LEDSchemArray(object):
     def writeFooter(self):
         self.schFid.write('$EndSCHEMATC\n')
 
-    def writeArrayWires(self):
-        ledPos = self.getLEDPos()
-
-        # Create stub wires on positive and negative ends of series LEDs
-        for i in range(self.numParallel):
-            # Positive stubs
-            x, y = ledPos[(i,0)]
-            x0, y0 = x-self.LEDWireOffset, y
-            x1, y1 = x0-self.stubLength, y
-            self.writeWire(x0,y0,x1,y1)
-
-            # Negative stubs
-            x, y = ledPos[(i,self.numSeries-1)]
-            x0, y0 = x+self.LEDWireOffset, y
-            x1, y1 = x0+self.stubLength, y
-            self.writeWire(x0,y0,x1,y1)
-
-        # Create connections between positive stubs
-        dx, dy = self.spacing
-        for i in range(self.numParallel):
-            x, y  = ledPos[(i,0)]
-            x0, y0 = x-self.LEDWireOffset-self.stubLength, y
-            x1, y1 = x0, y0 - dy
-            self.writeWire(x0,y0,x1,y1)
-            self.writeConnection(x0,y0)
-
-        # Create connections between negative stubs
-        for i in range(self.numParallel):
-            x, y = ledPos[(i,self.numSeries-1)]
-            x0, y0 = x+self.LEDWireOffset+self.stubLength, y
-            x1, y1 = x0, y + dy
-            self.writeWire(x0,y0,x1,y1)
-            self.writeConnection(x0,y0)
-
-        # Create connections between series LEDs
-        for i in range(self.numParallel):
-            for j in range(1,self.numSeries):
-                pos0 = ledPos[(i,j-1)]
-                pos1 = ledPos[(i,j)]
-                self.writeLEDToLEDWire(pos0, pos1)
-
-    def writeLEDToLEDWire(self,pos0, pos1):
-        """
-        Write wire connecting two horizontal LEDs
-        """
-        x0, y0 = pos0[0] + self.LEDWireOffset, pos0[1]
-        x1, y1 = pos1[0] - self.LEDWireOffset, pos1[1]
-        self.writeWire(x0,y0,x1,y1)
-
-    def writeWire(self,x0,y0,x1,y1,printFlag=False):
-        self.schFid.write('Wire Wire Line\n')
-        self.schFid.write('\t%d %d %d %d\n'%(x0,y0,x1,y1))
-        if printFlag == True:
-            print 'Wire Wire Line\n'
-            print '\t%d %d %d %d\n'%(x0,y0,x1,y1)
-
-    def writeConnection(self,x,y):
-        self.schFid.write('Connection ~ %d %d\n'%(x,y))
-
-    def writeLEDArray(self):
-        ledPos = self.getLEDPos()
-        for k,v in ledPos.iteritems():
-            i,j = k
-            x,y = v
-            self.writeLED(i,j,x,y)
+    @instrumented()
+    def writeArrayWires(self,ledPos=None):
+        if ledPos is None:
+            ledPos = self.getLEDPos()
+        self.schFid.write(getArrayWireText(ledPos,self.spacing,self.LEDWireOffset,self.stubLength))
+
+    @instrumented()
+    def writeLEDArray(self,ledPos=None):
+        if ledPos is None:
+            ledPos = self.getLEDPos()
+        for i, row in enumerate(ledPos.tolist()):
+            for j, (x,y) in enumerate(row):
+                self.writeLED(i,j,x,y)
+        self.instrument.count('writeLEDArray',components=self.numParallel*self.numSeries)
 
     def writeLED(self,i,j,x,y):
-        self.schFid.write('$Comp\n')
-
         refStr = 'D%d,%d'%(i,j)
-        self.schFid.write('L LED %s\n'%(refStr,))
-
-        timeStamp = hex(int(time.time()))[2:]
-        timeStamp = timeStamp.upper()
-        self.schFid.write('U 1 1 %s\n'%(timeStamp,))
-
-        self.schFid.write('P %d %d\n'%(x,y))
-
-        annotationX = x - self.annotationOffset[0]
-        annotationY = y - self.annotationOffset[1]
-        self.schFid.write('F 0 "%s" H %d %d  50 0000 CNN\n'%(refStr,annotationX, annotationY))
-
+        timeStamp = self.timeStamps.allocate()
         valueStr = 'LED'
-        valueX = x - self.labelOffset[0]
-        valueY = y - self.labelOffset[1]
-        self.schFid.write('F 1 "%s" H %d %d  50 0000 CNN\n'%(valueStr,valueX, valueY))
-        self.schFid.write('\t1    %d %d\n'%(x,y))
-        self.schFid.write('\t1    0    0    -1\n')
-
-        self.schFid.write('$EndComp\n')
+        self.schFid.write(LED_TEMPLATE%(
+            refStr,
+            timeStamp,
+            x, y,
+            refStr,
+            x - self.annotationOffset[0],
+            y - self.annotationOffset[1],
+            valueStr,
+            x - self.labelOffset[0],
+            y - self.labelOffset[1],
+            x, y,
+            ))
 
         # Save info for writing .cmp file
-        self.ledData[(i,j)] = {
-                'reference' : refStr,
-                'timeStamp' : timeStamp,
-                'value'     : valueStr,
-                'module'    : self.module,
-                }
-
-    def writeCmpFile(self):
-        with open(self.cmpFileName,'w') as cmpFid:
-            # Write header - need to modify so that the date string is correct
-            cmpFid.write('Cmp-Mod V01 Created by CVpcb (20090216-final) date = Thu 14 Jul 2011 05:35:17 PM PDT\n\n')
-            for i in range(self.numParallel):
-                for j in range(self.numSeries):
-                    data = self.ledData[(i,j)]
-                    cmpFid.write('BeginCmp\n')
-                    cmpFid.write('TimeStamp = /%s;\n'%(data['timeStamp'],))
-                    cmpFid.write('Reference = %s;\n'%(data['reference'],))
-                    cmpFid.write('ValuerCmp = %s;\n'%(data['value'],))
-                    cmpFid.write('IdModule  = %s;\n'%(data['module'],))
-                    cmpFid.write('EndCmp\n\n')
-            cmpFid.write('EndListe\n')
+        self.components.append(self.ledKind,timeStamp,i,j)
 
 
 HEADER_TEMPLATE = """EESchema Schematic File Version 2  date Thu 14 Jul 2011 12:55:08 PM PDT
@@ -0,0 +1,210 @@
+"""
+Copyright 2010  IO Rodeo Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+In-memory netlist of the LED array schematics. The generators return the
+connectivity of the schematic they write from getNetlist, and placeNetlist
+uses it to place the modules of a board and add tracks for the series
+links, e.g.
+
+    netlist = LEDSchemArray(params).getNetlist()
+    placer = ComponentPlacer('ledarray.brd')
+    placeNetlist(placer,netlist,(1.0,1.0),(0.3691,0.3691),trackWidth=0.017)
+    placer.write()
+"""
+from __future__ import division
+import numpy
+import brd_tools
+from schem_tools import ComponentSink
+
+
+class Netlist(ComponentSink):
+    """
+    Columnar netlist. Each component has a kind (see ComponentSink), one or
+    two reference indices and a (row, column) position in the schematic's
+    grid of components, -1 if it has none. Nets are numbered in the order
+    they are added and stored as (net, component, pin number) connections.
+    Components and connections are added in blocks of arrays which are
+    joined when first needed.
+    """
+
+    def __init__(self):
+        ComponentSink.__init__(self)
+        self.numComponents = 0
+        self.numNets = 0
+        self.componentBlocks = []
+        self.connectionBlocks = []
+        self.componentColumns = None
+        self.connectionColumns = None
+
+    def addComponents(self,kindNum,index0,index1=0,rows=-1,cols=-1):
+        """
+        Add components of a kind. The reference indices and grid positions
+        are arrays, or scalars, with one value per component. Returns the
+        array of component numbers.
+        """
+        index0 = numpy.asarray(index0,dtype=int).ravel()
+        num = index0.shape[0]
+        columns = [numpy.zeros(num,dtype=int) + kindNum, index0]
+        columns.extend(numpy.zeros(num,dtype=int) + numpy.ravel(v) for v in (index1,rows,cols))
+        self.componentBlocks.append(columns)
+        self.componentColumns = None
+        comps = numpy.arange(self.numComponents,self.numComponents+num)
+        self.numComponents += num
+        return comps
+
+    def addNets(self,comps,pins):
+        """
+        Add nets. The (numNets, numPins) arrays comps and pins give the
+        component and pin number of each connection of each net, pins may be
+        a scalar or a row of pin numbers. Returns the array of net numbers.
+        """
+        comps = numpy.atleast_2d(numpy.asarray(comps,dtype=int))
+        numNets, numPins = comps.shape
+        pins = numpy.zeros(comps.shape,dtype=int) + pins
+        nets = numpy.arange(self.numNets,self.numNets+numNets)
+        self.connectionBlocks.append([
+            numpy.repeat(nets,numPins),
+            comps.ravel(),
+            pins.ravel(),
+            ])
+        self.connectionColumns = None
+        self.numNets += numNets
+        return nets
+
+    def getComponentColumns(self):
+        """
+        Returns the kind, index0, index1, row and column arrays of the
+        components.
+        """
+        if self.componentColumns is None:
+            if self.componentBlocks:
+                blocks = zip(*self.componentBlocks)
+                self.componentColumns = [numpy.concatenate(column) for column in blocks]
+            else:
+                self.componentColumns = [numpy.zeros(0,dtype=int) for k in range(5)]
+            self.componentBlocks = [self.componentColumns]
+        return self.componentColumns
+
+    def getConnectionColumns(self):
+        """
+        Returns the net, component and pin number arrays of the connections
+        sorted by net.
+        """
+        if self.connectionColumns is None:
+            if self.connectionBlocks:
+                blocks = zip(*self.connectionBlocks)
+                columns = [numpy.concatenate(column) for column in blocks]
+                order = numpy.argsort(columns[0],kind='mergesort')
+                self.connectionColumns = [column[order] for column in columns]
+            else:
+                self.connectionColumns = [numpy.zeros(0,dtype=int) for k in range(3)]
+            self.connectionBlocks = [self.connectionColumns]
+        return self.connectionColumns
+
+    def getRefs(self,comps=None):
+        """
+        Returns list of the references of the components comps, all
+        components by default.
+        """
+        kinds, index0, index1, rows, cols = self.getComponentColumns()
+        if comps is not None:
+            kinds, index0, index1 = kinds[comps], index0[comps], index1[comps]
+        values = zip(kinds.tolist(),index0.tolist(),index1.tolist())
+        return [self.getReference(kindNum,i,j) for kindNum, i, j in values]
+
+    def getNetName(self,net):
+        return 'N-%06d'%(net+1,)
+
+    def getTwoPinNets(self):
+        """
+        Returns the net, first component, first pin, second component and
+        second pin arrays of the nets connecting exactly two pins.
+        """
+        nets, comps, pins = self.getConnectionColumns()
+        numPins = numpy.bincount(nets,minlength=self.numNets)
+        first = numpy.searchsorted(nets,numpy.flatnonzero(numPins == 2))
+        return nets[first], comps[first], pins[first], comps[first+1], pins[first+1]
+
+    def getLayout(self,start,step,ang=0):
+        """
+        Grid layout of the components with a grid position, with the first
+        at start = (x,y) and spacing step = (dx,dy) in inches. Returns (refs,
+        x, y, ang) as the functions in layouts.py do.
+        """
+        kinds, index0, index1, rows, cols = self.getComponentColumns()
+        comps = numpy.flatnonzero((rows >= 0) & (cols >= 0))
+        x = start[0] + cols[comps]*step[0]
+        y = start[1] + rows[comps]*step[1]
+        ang = numpy.zeros(x.shape) + ang
+        return self.getRefs(comps), x, y, ang
+
+
+def addLEDArray(netlist,ledKind,numParallel,numSeries,rowOffset=0):
+    """
+    Add a numParallel x numSeries array of LEDs to netlist. The LEDs of each
+    row are in series, anode (pin 1) to cathode (pin 2), and the rows are in
+    parallel between a net joining the anodes of the first column and a net
+    joining the cathodes of the last column. The LED in row i and column j
+    has reference indices (i + rowOffset, j). Returns the (numParallel,
+    numSeries) array of component numbers.
+    """
+    rows, cols = numpy.mgrid[0:numParallel,0:numSeries]
+    rows = rows + rowOffset
+    comps = netlist.addComponents(ledKind,rows,cols,rows,cols)
+    comps = comps.reshape(numParallel,numSeries)
+    if numSeries > 1:
+        seriesComps = numpy.column_stack((comps[:,:-1].ravel(),comps[:,1:].ravel()))
+        netlist.addNets(seriesComps,(LED_CATHODE,LED_ANODE))
+    netlist.addNets(comps[:,0].reshape(1,-1),LED_ANODE)
+    netlist.addNets(comps[:,-1].reshape(1,-1),LED_CATHODE)
+    return comps
+
+
+def placeNetlist(placer,netlist,start,step,ang=0,trackWidth=None,layer='component'):
+    """
+    Place the modules of the netlist's components on a grid with
+    ComponentPlacer placer, see Netlist.getLayout, and, if trackWidth is
+    given, add a track between the pads of each two pin net, such as the
+    series links of an LED array. Track widths are in inches. Returns the
+    result of setModulePositions.
+    """
+    result = placer.setModulePositions(*netlist.getLayout(start,step,ang))
+    if trackWidth is None:
+        return result
+    nets, comps0, pins0, comps1, pins1 = netlist.getTwoPinNets()
+    if nets.shape[0] == 0:
+        return result
+    modules0 = [placer.modules[ref] for ref in netlist.getRefs(comps0)]
+    modules1 = [placer.modules[ref] for ref in netlist.getRefs(comps1)]
+    pos0 = brd_tools.getPadPositions(modules0,[str(pin) for pin in pins0.tolist()])
+    pos1 = brd_tools.getPadPositions(modules1,[str(pin) for pin in pins1.tolist()])
+    netCodes = [getPadNet(module,str(pin)) for module, pin in zip(modules0,pins0.tolist())]
+    placer.addTracks(numpy.hstack((pos0,pos1))/10000,trackWidth,layer,netCodes)
+    return result
+
+
+def getPadNet(module,padName):
+    """
+    Returns the net code of a pad of a module.
+    """
+    for pad in module.pads:
+        if pad.name == padName:
+            return pad.net
+    raise KeyError, 'module, %s, has no pad %s'%(module.ref,padName)
+
+
+# LED pin numbers
+LED_ANODE = 1
+LED_CATHODE = 2
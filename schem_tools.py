@@ -0,0 +1,469 @@
+"""
+Copyright 2010  IO Rodeo Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Tools shared by the LED array schematic generators.
+"""
+from __future__ import division
+import os
+import array
+import itertools
+import shutil
+import hashlib
+import tempfile
+import zlib
+import numpy
+from instrument import instrumented, NULL_INSTRUMENT
+
+DEFAULT_FLUSH_SIZE = 4096
+
+DEFAULT_OUTPUT_CACHE_SIZE = 256*2**20
+
+# Parameters which do not change the generated output
+OUTPUT_NEUTRAL_PARAMS = (
+        'flushSize',
+        'outputCacheDir',
+        'outputCacheSize',
+        'numProcesses',
+        'streamCmp',
+        )
+
+
+def getOutputParams(params):
+    """
+    Returns sorted list of the (key, value) items of the parameter dictionary
+    which affect the generated output.
+    """
+    return sorted((k,v) for k,v in params.iteritems() if k not in OUTPUT_NEUTRAL_PARAMS)
+
+
+def getTimeStampSeed(params):
+    """
+    Returns a timestamp seed derived from the parameter dictionary, so that
+    the same parameters always give the same timestamps.
+    """
+    return zlib.crc32(repr(getOutputParams(params))) & 0x7FFFFFFF
+
+
+class OutputCache(object):
+    """
+    Content addressed on-disk cache of generated output files. Outputs are
+    stored in cacheDir under a key computed from the generator's parameters
+    and version. The least recently used entries are evicted when the total
+    size of the cache exceeds maxSize bytes.
+    """
+
+    def __init__(self,cacheDir,maxSize=DEFAULT_OUTPUT_CACHE_SIZE):
+        self.cacheDir = cacheDir
+        self.maxSize = maxSize
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+
+    def getKey(self,generatorName,generatorVersion,params):
+        """
+        Returns the cache key for the given generator and parameters.
+        """
+        keyStr = repr((generatorName, generatorVersion, getOutputParams(params)))
+        return hashlib.sha1(keyStr).hexdigest()
+
+    def getCacheFileName(self,key,fileName):
+        return os.path.join(self.cacheDir,key + os.path.splitext(fileName)[1])
+
+    def fetch(self,key,fileNames):
+        """
+        Copy the cached outputs for key to fileNames. Returns False if the
+        cache has no complete entry for key.
+        """
+        cacheFileNames = [self.getCacheFileName(key,fileName) for fileName in fileNames]
+        if not all(os.path.exists(cacheFileName) for cacheFileName in cacheFileNames):
+            return False
+        for cacheFileName, fileName in zip(cacheFileNames,fileNames):
+            shutil.copyfile(cacheFileName,fileName)
+            # Mark entry as recently used
+            os.utime(cacheFileName,None)
+        return True
+
+    def store(self,key,fileNames):
+        """
+        Copy the outputs fileNames into the cache under key and evict old
+        entries if the cache is over size.
+        """
+        for fileName in fileNames:
+            tempFid, tempName = tempfile.mkstemp(dir=self.cacheDir)
+            os.close(tempFid)
+            shutil.copyfile(fileName,tempName)
+            os.rename(tempName,self.getCacheFileName(key,fileName))
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache size is within
+        maxSize.
+        """
+        entries = {}
+        for name in os.listdir(self.cacheDir):
+            cacheFileName = os.path.join(self.cacheDir,name)
+            stat = os.stat(cacheFileName)
+            key = os.path.splitext(name)[0]
+            size, mtime, cacheFileNames = entries.get(key,(0,0,[]))
+            cacheFileNames.append(cacheFileName)
+            entries[key] = (size + stat.st_size, max(mtime,stat.st_mtime), cacheFileNames)
+        totalSize = sum(size for size, mtime, cacheFileNames in entries.itervalues())
+        for size, mtime, cacheFileNames in sorted(entries.values(),key=lambda x: x[1]):
+            if totalSize <= self.maxSize:
+                break
+            for cacheFileName in cacheFileNames:
+                os.remove(cacheFileName)
+            totalSize -= size
+
+
+class TimeStampAllocator(object):
+    """
+    Allocates the timestamps KiCad uses as unique component IDs. Timestamps
+    are allocated in increasing order starting from seed, so each component
+    of a run gets its own timestamp and repeated runs with the same seed
+    give identical output.
+    """
+
+    def __init__(self,seed):
+        self.current = seed
+
+    def allocate(self):
+        """
+        Returns the next timestamp.
+        """
+        timeStamp = self.current
+        self.current += 1
+        return timeStamp
+
+    def allocateRange(self,num):
+        """
+        Returns array of the next num timestamps.
+        """
+        timeStamps = numpy.arange(self.current,self.current+num,dtype=numpy.int64)
+        self.current += num
+        return timeStamps
+
+
+def formatRecords(template,values):
+    """
+    Returns the records obtained by formatting template with each row of the
+    2D array values, formatted in a single operation.
+    """
+    values = numpy.asarray(values)
+    if values.size == 0:
+        return ''
+    return (template*values.shape[0])%tuple(values.ravel().tolist())
+
+
+def getArrayWireText(ledPos,spacing,wireOffset,stubLength):
+    """
+    Returns the wires of an LED array with LED positions ledPos, a
+    (numParallel, numSeries, 2) array. Each row of LEDs is wired in series,
+    with the wires ending wireOffset from the LED centers, and has stubs of
+    length stubLength at both ends joined by rails with connections to the
+    next row at spacing.
+    """
+    dx, dy = spacing
+    firstX, firstY = ledPos[:,0,0], ledPos[:,0,1]
+    lastX, lastY = ledPos[:,-1,0], ledPos[:,-1,1]
+    text = []
+
+    # Create stub wires on positive and negative ends of series LEDs
+    posStubs = numpy.column_stack((
+        firstX - wireOffset, firstY,
+        firstX - wireOffset - stubLength, firstY,
+        ))
+    negStubs = numpy.column_stack((
+        lastX + wireOffset, lastY,
+        lastX + wireOffset + stubLength, lastY,
+        ))
+    stubs = numpy.hstack((posStubs,negStubs)).reshape(-1,4)
+    text.append(formatRecords(WIRE_TEMPLATE,stubs))
+
+    # Create connections between positive stubs
+    x0 = firstX - wireOffset - stubLength
+    posConns = numpy.column_stack((x0, firstY, x0, firstY - dy, x0, firstY))
+    text.append(formatRecords(WIRE_TEMPLATE + CONNECTION_TEMPLATE,posConns))
+
+    # Create connections between negative stubs
+    x0 = lastX + wireOffset + stubLength
+    negConns = numpy.column_stack((x0, lastY, x0, lastY + dy, x0, lastY))
+    text.append(formatRecords(WIRE_TEMPLATE + CONNECTION_TEMPLATE,negConns))
+
+    # Create connections between series LEDs
+    seriesWires = numpy.concatenate((
+        ledPos[:,:-1,:] + (wireOffset,0),
+        ledPos[:,1:,:] - (wireOffset,0),
+        ),axis=2)
+    text.append(formatRecords(WIRE_TEMPLATE,seriesWires.reshape(-1,4)))
+    return ''.join(text)
+
+
+class ComponentSink(object):
+    """
+    Base class for the objects the generators pass their components to.
+    Components are grouped in kinds sharing a reference format, value and
+    module. The reference of a component is the reference format formatted
+    with its one or two reference indices.
+    """
+
+    def __init__(self):
+        self.kinds = []
+        self.kindNums = {}
+
+    def addKind(self,refFormat,value,module):
+        """
+        Register a kind of component and return its number.
+        """
+        kind = (refFormat, intern(value), intern(module))
+        try:
+            return self.kindNums[kind]
+        except KeyError:
+            self.kindNums[kind] = len(self.kinds)
+            self.kinds.append(kind)
+            return self.kindNums[kind]
+
+    def getReference(self,kindNum,index0,index1):
+        refFormat = self.kinds[kindNum][0]
+        if refFormat.count('%') == 2:
+            return refFormat%(index0,index1)
+        else:
+            return refFormat%(index0,)
+
+
+class ComponentStore(ComponentSink):
+    """
+    Compact columnar store of the components written to a schematic, kept
+    for writing the .cmp file. Each component is stored as a kind, a
+    timestamp and one or two reference indices in parallel arrays. The
+    reference format, value and module strings are shared by all components
+    of a kind.
+    """
+
+    def __init__(self):
+        ComponentSink.__init__(self)
+        self.kindColumn = array.array('B')
+        self.timeStampColumn = array.array('I')
+        self.index0Column = array.array('i')
+        self.index1Column = array.array('i')
+
+    def append(self,kindNum,timeStamp,index0,index1=0):
+        self.kindColumn.append(kindNum)
+        self.timeStampColumn.append(timeStamp)
+        self.index0Column.append(index0)
+        self.index1Column.append(index1)
+
+    def extend(self,other):
+        """
+        Append all components of another store.
+        """
+        kindNumMap = [self.addKind(*kind) for kind in other.kinds]
+        self.kindColumn.extend(array.array('B',[kindNumMap[k] for k in other.kindColumn]))
+        self.timeStampColumn.extend(other.timeStampColumn)
+        self.index0Column.extend(other.index0Column)
+        self.index1Column.extend(other.index1Column)
+
+    def __len__(self):
+        return len(self.kindColumn)
+
+    def __iter__(self):
+        """
+        Iterate over the components returning (timeStamp, reference, value,
+        module) tuples in the order they were added.
+        """
+        columns = (self.kindColumn, self.timeStampColumn, self.index0Column, self.index1Column)
+        for kindNum, timeStamp, index0, index1 in itertools.izip(*columns):
+            refFormat, value, module = self.kinds[kindNum]
+            yield timeStamp, self.getReference(kindNum,index0,index1), value, module
+
+
+class CmpFileSink(ComponentSink):
+    """
+    Component sink with the ComponentStore interface which writes the .cmp
+    entry of each component to cmpFid as soon as it is added, so the .cmp
+    file is written in the same pass as the schematic.
+    """
+
+    def __init__(self,cmpFid):
+        ComponentSink.__init__(self)
+        self.cmpFid = cmpFid
+
+    def append(self,kindNum,timeStamp,index0,index1=0):
+        refFormat, value, module = self.kinds[kindNum]
+        reference = self.getReference(kindNum,index0,index1)
+        self.cmpFid.write(CMP_TEMPLATE%(timeStamp,reference,value,module))
+
+    def extend(self,other):
+        """
+        Write the entries of all components of a ComponentStore.
+        """
+        for component in other:
+            self.cmpFid.write(CMP_TEMPLATE%component)
+
+
+class ChunkWriter(object):
+    """
+    File like object which collects the strings written to it and passes them
+    on to the underlying file in batches of flushSize strings with a single
+    writelines call.
+    """
+
+    def __init__(self,fid,flushSize=DEFAULT_FLUSH_SIZE):
+        self.fid = fid
+        self.flushSize = flushSize
+        self.chunks = []
+
+    def write(self,chunk):
+        self.chunks.append(chunk)
+        if len(self.chunks) >= self.flushSize:
+            self.flush()
+
+    def flush(self):
+        self.fid.writelines(self.chunks)
+        self.chunks = []
+
+
+class SchemGenerator(object):
+    """
+    Base class of the schematic generators holding the shared parameter
+    handling, output caching and the .cmp file. Subclasses set
+    generatorVersion and provide setComponentSink and writeSchFile. Defaults
+    set before calling __init__ are overridden by the params dictionary.
+    """
+
+    # Increment in the subclass when changes to it change its output
+    generatorVersion = 1
+
+    def __init__(self,params,instrument=None):
+        """
+        Set up the generator from the params dictionary. Phase statistics
+        are recorded by instrument if given, see instrument.py.
+        """
+        self.instrument = NULL_INSTRUMENT if instrument is None else instrument
+        self.flushSize = DEFAULT_FLUSH_SIZE
+        self.timeStampSeed = getTimeStampSeed(params)
+        self.outputCacheDir = None
+        self.outputCacheSize = DEFAULT_OUTPUT_CACHE_SIZE
+        self.streamCmp = False
+        self.params = params
+        # Add parameters as attributes
+        for k,v in params.iteritems():
+            setattr(self, k, v)
+        self.schFileName = '%s.sch'%(self.name,)
+        self.cmpFileName = '%s.cmp'%(self.name,)
+        self.cacheFileName = '%s.cache'%(self.name,)
+
+    @instrumented()
+    def write(self,force=False):
+        """
+        Write the .sch and .cmp files. If the outputCacheDir parameter is set
+        the outputs are taken from the cache when it holds an entry for the
+        same parameters, unless force is True.
+        """
+        if self.outputCacheDir is None:
+            self.writeFiles()
+            return
+
+        cache = OutputCache(self.outputCacheDir,self.outputCacheSize)
+        params = dict(self.params, timeStampSeed=self.timeStampSeed)
+        key = cache.getKey(self.__class__.__name__,self.generatorVersion,params)
+        fileNames = [self.schFileName, self.cmpFileName]
+        if not force and cache.fetch(key,fileNames):
+            return
+        self.writeFiles()
+        cache.store(key,fileNames)
+
+    @instrumented()
+    def writeFiles(self):
+        """
+        Write the .sch and .cmp files. If the streamCmp parameter is set both
+        files are written in a single generation pass, otherwise the
+        components are kept in a ComponentStore until the .sch file is done.
+        """
+        if self.streamCmp:
+            with open(self.cmpFileName,'w') as fid:
+                cmpFid = ChunkWriter(fid,self.flushSize)
+                cmpFid.write(CMP_HEADER)
+                self.setComponentSink(CmpFileSink(cmpFid))
+                self.writeSchFile()
+                cmpFid.write(CMP_FOOTER)
+                cmpFid.flush()
+            self.instrument.countFile('writeFiles',self.cmpFileName)
+        else:
+            self.setComponentSink(ComponentStore())
+            self.writeSchFile()
+            self.writeCmpFile()
+
+    @instrumented()
+    def writeCmpFile(self):
+        """
+        Write the .cmp file from the components kept in the ComponentStore.
+        """
+        with open(self.cmpFileName,'w') as fid:
+            cmpFid = ChunkWriter(fid,self.flushSize)
+            cmpFid.write(CMP_HEADER)
+            for component in self.components:
+                cmpFid.write(CMP_TEMPLATE%component)
+            cmpFid.write(CMP_FOOTER)
+            cmpFid.flush()
+        self.instrument.countFile('writeCmpFile',self.cmpFileName)
+
+
+# Record templates for the .sch and .cmp files
+WIRE_TEMPLATE = 'Wire Wire Line\n\t%d %d %d %d\n'
+
+CONNECTION_TEMPLATE = 'Connection ~ %d %d\n'
+
+# Arguments: ref, timeStamp, x, y, ref, annotationX, annotationY, value,
+# valueX, valueY, x, y
+LED_TEMPLATE = (
+        '$Comp\n'
+        'L LED %s\n'
+        'U 1 1 %08X\n'
+        'P %d %d\n'
+        'F 0 "%s" H %d %d  50 0000 CNN\n'
+        'F 1 "%s" H %d %d  50 0000 CNN\n'
+        '\t1    %d %d\n'
+        '\t1    0    0    -1\n'
+        '$EndComp\n'
+        )
+
+# Arguments: ref, timeStamp, x, y, ref, annotationX, annotationY, value,
+# valueX, valueY, x, y
+CONN_TEMPLATE = (
+        '$Comp\n'
+        'L CONN_2 %s\n'
+        'U 1 1 %08X\n'
+        'P %d %d\n'
+        'F 0 "%s" V %d %d  40 0000 C CNN\n'
+        'F 1 "%s" V %d %d  40 0000 C CNN\n'
+        '\t1    %d %d\n'
+        '\t1    0    0    -1\n'
+        '$EndComp\n'
+        )
+
+# Arguments: timeStamp, reference, value, module
+CMP_TEMPLATE = (
+        'BeginCmp\n'
+        'TimeStamp = /%08X;\n'
+        'Reference = %s;\n'
+        'ValuerCmp = %s;\n'
+        'IdModule  = %s;\n'
+        'EndCmp\n\n'
+        )
+
+CMP_HEADER = 'Cmp-Mod V01 Created by CVpcb (20090216-final) date = Thu 14 Jul 2011 05:35:17 PM PDT\n\n'
+
+CMP_FOOTER = 'EndListe\n'
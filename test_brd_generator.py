@@ -0,0 +1,93 @@
+"""
+Copyright 2010  IO Rodeo Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Tests of the boards generated by BrdGenerator, run with
+
+    python -m unittest test_brd_generator
+"""
+from __future__ import division
+import os
+import shutil
+import tempfile
+import unittest
+import brd_generator
+import footprints
+
+
+class TestBrdGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempDir,'test.brd')
+        self.footprint = footprints.Footprint(SHAPE3D_MODULE.splitlines(True))
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def generate(self,refs,value=None):
+        generator = brd_generator.BrdGenerator()
+        generator.addModules(self.footprint,refs,1.0,1.0,value=value)
+        generator.write(self.filename)
+        with open(self.filename,'r') as fid:
+            return fid.read()
+
+    def testShape3DScaleKept(self):
+        text = self.generate(['D1', 'D2'])
+        self.assertEqual(text.count('Sc 1.000000 1.000000 1.000000\n'),2)
+        self.assertEqual(text.count('$SHAPE3D\n'),2)
+
+    def testModuleTimeStampsReplaced(self):
+        text = self.generate(['D1'])
+        self.assertNotIn('Sc 00000000\n',text)
+        self.assertNotIn('AR /00000000\n',text)
+        self.assertEqual(text.count('\nSc '),2)
+        self.assertEqual(text.count('\nAR /'),1)
+
+    def testValueDefaultsToFootprintValue(self):
+        text = self.generate(['D1'])
+        self.assertIn('N"LED"\n',text)
+        self.assertNotIn('N"LED-5MM"\n',text)
+        text = self.generate(['D1'],value='LED_RED')
+        self.assertIn('N"LED_RED"\n',text)
+
+
+SHAPE3D_MODULE = """$MODULE LED-5MM
+Po 0 0 0 15 00000000 00000000 ~~
+Li LED-5MM
+Sc 00000000
+AR /00000000
+Op 0 0 0
+T0 0 -1000 400 400 0 100 N V 21 N"D"
+T1 0 1000 400 400 0 100 N V 21 N"LED"
+DS -500 -500 500 -500 80 21
+$PAD
+Sh "1" C 600 600 0 0 0
+Dr 320 0 0
+At STD N 00E0FFFF
+Ne 0 ""
+Po -500 0
+$EndPAD
+$SHAPE3D
+Na "discret/leds/led5_vertical.wrl"
+Sc 1.000000 1.000000 1.000000
+Of 0.000000 0.000000 0.000000
+Ro 0.000000 0.000000 0.000000
+$EndSHAPE3D
+$EndMODULE  LED-5MM
+"""
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+Copyright 2010  IO Rodeo Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Tests of the board tools, run with
+
+    python -m unittest test_brd_tools
+"""
+from __future__ import division
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+import benchmark
+import brd_tools
+
+
+class TestPlacerParity(unittest.TestCase):
+    """
+    The placers which apply moves when the board is written must give the
+    same board as ComponentPlacer for the same sequence of moves.
+    """
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempDir,'test.brd')
+        benchmark.makeSyntheticBoard(self.filename,9)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def applySmallMoves(self,placer):
+        for k in range(2):
+            placer.setModulePos('D0,0',0.00005,0.00005,0.5)
+
+    def applyMoves(self,placer):
+        self.applySmallMoves(placer)
+        placer.setModulePos('D1,1',-0.00015,-0.00125,-0.5)
+        placer.setModulePos('D1,1',-1.00005,0.00025,1.5)
+        placer.setModulePositions(['D0,0','D2,1','D1,2'],0.00035,[-0.00005,0.01,0.00015],450.5)
+        placer.setModulePositions(['D2,1','D0,0'],-0.00025,0.00005,-900.5)
+
+    def getPlacedText(self,placerClass,applyMoves):
+        filename = os.path.join(self.tempDir,'%s.brd'%(placerClass.__name__,))
+        shutil.copy(self.filename,filename)
+        placer = placerClass(filename)
+        applyMoves(placer)
+        placer.write()
+        with open(filename,'r') as fid:
+            return fid.read()
+
+    def checkParity(self,placerClass):
+        for applyMoves in (self.applySmallMoves, self.applyMoves):
+            expected = self.getPlacedText(brd_tools.ComponentPlacer,applyMoves)
+            self.assertEqual(self.getPlacedText(placerClass,applyMoves),expected)
+
+    def testRepeatedSmallMoves(self):
+        text = self.getPlacedText(brd_tools.ComponentPlacer,self.applySmallMoves)
+        self.assertIn('Po 10002 10002 2 ',text)
+
+    def testIncrementalPlacer(self):
+        self.checkParity(brd_tools.IncrementalPlacer)
+
+    def testStreamingBrdWriter(self):
+        self.checkParity(brd_tools.StreamingBrdWriter)
+
+
+class TestIncrementalPlacerIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempDir,'test.brd')
+        benchmark.makeSyntheticBoard(self.filename,4)
+        self.indexFileName = '%s.idx'%(self.filename,)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def testCorruptIndexRebuilt(self):
+        placer = brd_tools.IncrementalPlacer(self.filename)
+        modules = placer.modules
+        with open(self.indexFileName,'rb') as fid:
+            data = fid.read()
+        for badData in (data[:len(data)//2], 'not a pickle', '\x80\x02K\x01.'):
+            with open(self.indexFileName,'wb') as fid:
+                fid.write(badData)
+            for verify in (False, True):
+                placer = brd_tools.IncrementalPlacer(self.filename,verify=verify)
+                self.assertEqual(placer.modules,modules)
+
+    def testStaleIndexDetected(self):
+        placer = brd_tools.IncrementalPlacer(self.filename)
+        placer.modules['D0,0'][2] += 1
+        placer.setModulePos('D0,0',0.1,0.1,0)
+        self.assertRaises(ValueError,placer.write)
+
+
+class TestPlacementChecker(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempDir,'test.brd')
+        benchmark.makeSyntheticBoard(self.filename,100)
+        drawer = brd_tools.SegmentDrawer(self.filename)
+        drawer.addCircularNgon(7,(2.8,2.8),2.2,0.015,rotAng=10)
+        drawer.addLineSegment(0.2,0.3,5.1,5.4,0.015)
+        drawer.write()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def getEdgeViolations(self,checker,ref):
+        """
+        Returns the edge violations of module ref found by checking every
+        edge segment.
+        """
+        box = checker.moduleIndex.boxes[ref]
+        violations = []
+        for segment in checker.edgeSegments:
+            dist = brd_tools.getSegmentBoxDistance(segment[:4].tolist(),box)
+            if dist < 0.5*segment[4] + checker.edgeClearance:
+                violations.append(('edge', ref, tuple((segment[:4]/10000).tolist())))
+        return sorted(violations)
+
+    def testDiagonalEdges(self):
+        placer = brd_tools.ComponentPlacer(self.filename)
+        placer.enableChecks(0.05)
+        checker = placer.checker
+        numCells = sum(len(cells) for cells in checker.edgeIndex.keyCells.itervalues())
+        numBoxCells = sum(len(checker.edgeIndex.getCells(box)) for box in checker.edgeIndex.boxes.itervalues())
+        self.assertLess(numCells,numBoxCells/2)
+        for ref in sorted(placer.modules):
+            violations = [v for v in checker.check([ref]) if v[0] == 'edge']
+            self.assertEqual(sorted(violations),self.getEdgeViolations(checker,ref))
+
+    def testNoModules(self):
+        checker = brd_tools.PlacementChecker([],numpy.zeros((0,5)))
+        self.assertEqual(checker.moduleIndex.cellSize,brd_tools.DEFAULT_CHECK_CELL_SIZE)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    unittest.main()